@@ -0,0 +1,149 @@
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+__all__ = [
+    'BannerSpec',
+    'Outcome',
+    'Banner',
+    'load_banners',
+    'compile_banner',
+    'BANNERS'
+]
+
+
+@dataclass(frozen=True)
+class BannerSpec:
+    """The rules of a banner, pulls are counted from the last five star starting at 1"""
+    name: str
+    base_rate: float
+    # The first pull with a raised rate, every pull after it adds ramp to the rate
+    soft_pity: int
+    ramp: float
+    # The pull on which a five star is certain
+    hard_pity: int
+    # The chance a five star is featured instead of standard, losing it guarantees the next one is featured
+    featured_rate: float
+    # How many featured five stars share the banner, only one of them is the target
+    featured: int = 1
+    # Missed targets needed before the next five star is the target, None for banners without a fate path
+    fate_points: Optional[int] = None
+
+    def rate(self, pity: int) -> float:
+        pull = pity + 1
+
+        if pull >= self.hard_pity:
+            return 1.0
+
+        return min(self.base_rate + self.ramp * max(0, pull - self.soft_pity + 1), 1.0)
+
+    @classmethod
+    def load(cls, name: str, data: dict) -> 'BannerSpec':
+        return cls(name, **data)
+
+
+class Outcome(NamedTuple):
+    probability: float
+    target: bool
+    guaranteed: bool
+    fate_points: int
+
+
+class Banner:
+    """A banner spec compiled into a rate per pity and the five star outcomes of every guarantee state"""
+    def __init__(self, spec: BannerSpec) -> None:
+        self.spec = spec
+
+        self.rates = tuple(spec.rate(pity) for pity in range(spec.hard_pity))
+
+        # From this pity on the next pull is always a five star
+        self.certain = next(pity for pity, rate in enumerate(self.rates) if rate >= 1.0)
+
+        fate_range = range(spec.fate_points + 1) if spec.fate_points is not None else range(1)
+
+        self.outcomes: dict[tuple[bool, int], tuple[Outcome, ...]] = {
+            (guaranteed, fate_points): self._outcomes(guaranteed, fate_points) for guaranteed in (False, True) for fate_points in fate_range
+        }
+
+        self.cumulative = {key: tuple(accumulate(outcome.probability for outcome in outcomes)) for key, outcomes in self.outcomes.items()}
+
+        # Batched sampling, hazard[p] is minus the log chance of no five star in the first p pulls and is infinite past the certain pity
+        with np.errstate(divide='ignore'):
+            self.hazard = np.concatenate([[0.0], np.cumsum(-np.log1p(-np.array(self.rates[:self.certain + 1])))])
+
+        # Outcome tables indexed by [guaranteed, fate points, outcome], unused outcomes are never reached
+        shape = (2, len(fate_range), max(len(outcomes) for outcomes in self.outcomes.values()))
+
+        self.outcome_bounds = np.ones(shape, dtype=np.float64)
+        self.outcome_target = np.zeros(shape, dtype=bool)
+        self.outcome_guaranteed = np.zeros(shape, dtype=bool)
+        self.outcome_fate_points = np.zeros(shape, dtype=np.int64)
+
+        for (guaranteed, fate_points), outcomes in self.outcomes.items():
+            for i, (outcome, bound) in enumerate(zip(outcomes, self.cumulative[guaranteed, fate_points])):
+                self.outcome_bounds[int(guaranteed), fate_points, i] = bound
+                self.outcome_target[int(guaranteed), fate_points, i] = outcome.target
+                self.outcome_guaranteed[int(guaranteed), fate_points, i] = outcome.guaranteed
+                self.outcome_fate_points[int(guaranteed), fate_points, i] = outcome.fate_points
+
+            self.outcome_bounds[int(guaranteed), fate_points, len(outcomes) - 1] = 1.0
+
+    def _outcomes(self, guaranteed: bool, fate_points: int) -> tuple[Outcome, ...]:
+        spec = self.spec
+
+        if spec.fate_points is not None and fate_points >= spec.fate_points:
+            return (Outcome(1.0, True, False, 0),)
+
+        missed = fate_points + 1 if spec.fate_points is not None else 0
+
+        featured = 1.0 if guaranteed else spec.featured_rate
+
+        outcomes = [
+            Outcome(featured / spec.featured, True, False, 0),
+            Outcome(featured * (spec.featured - 1) / spec.featured, False, False, missed),
+            Outcome(1.0 - featured, False, True, missed)
+        ]
+
+        return tuple(outcome for outcome in outcomes if outcome.probability > 0)
+
+    def rate(self, pity: int) -> float:
+        return self.rates[min(pity, len(self.rates) - 1)]
+
+    def key(self, guaranteed: bool, fate_points: int) -> tuple[bool, int]:
+        if self.spec.fate_points is None:
+            return bool(guaranteed), 0
+
+        return bool(guaranteed), min(fate_points, self.spec.fate_points)
+
+    def draw(self, guaranteed: bool, fate_points: int, roll: float) -> Outcome:
+        """The five star outcome a uniform roll in [0, 1) lands on"""
+        key = self.key(guaranteed, fate_points)
+
+        for outcome, bound in zip(self.outcomes[key], self.cumulative[key]):
+            if roll < bound:
+                return outcome
+
+        return self.outcomes[key][-1]
+
+    def __repr__(self) -> str:
+        return f'Banner({self.spec!r})'
+
+
+@lru_cache(maxsize=None)
+def compile_banner(spec: BannerSpec) -> Banner:
+    return Banner(spec)
+
+
+def load_banners(fp: Path = Path(__file__).with_name('banners.json')) -> dict[str, Banner]:
+    with fp.open('r') as banners:
+        data = json.load(banners)
+
+    return {name: compile_banner(BannerSpec.load(name, spec)) for name, spec in data.items()}
+
+
+BANNERS = load_banners()
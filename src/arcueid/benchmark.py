@@ -0,0 +1,279 @@
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+import click
+import numpy as np
+
+from . import VERSION
+from .banners import BANNERS
+from .cogs import gacha
+from .cogs.genshin import (
+    CHARACTER_SOLVER, WEAPON_SOLVER, CharacterSimulation, CharacterState, Quantiles, WeaponState,
+    cumulative, pulls_character, pulls_character_levels, pulls_plan, pulls_weapon, pulls_weapon_levels, to_cumulative
+)
+
+
+__all__ = [
+    'benchmark'
+]
+
+
+CHARACTER_PITIES = (0, 30, 60, 75, 89)
+WEAPON_PITIES = (0, 30, 60, 77)
+
+# Monte Carlo cross checks as (banner, level, pity, guaranteed, fate points)
+CHECKS = (
+    ('character', 0, 0, False, 0),
+    ('character', 2, 40, True, 0),
+    ('character', 6, 0, False, 0),
+    ('weapon', 1, 0, False, 0),
+    ('weapon', 1, 50, True, 1),
+    ('weapon', 3, 0, False, 0)
+)
+
+# Two sided, a correct engine fails a mean check about once in sixteen thousand runs
+MEAN_Z = 4.0
+# Kolmogorov-Smirnov critical value at the 0.1% level, scaled by the root of the sample count
+KS_CRITICAL = 1.95
+
+
+def reset() -> None:
+    """Drops every cached distribution so the next query is cold"""
+    for function in (pulls_character, pulls_weapon, pulls_character_levels, pulls_weapon_levels):
+        function.cache_clear()
+
+    CHARACTER_SOLVER.clear()
+    WEAPON_SOLVER.clear()
+
+
+def timed(function: Callable[[], object]) -> tuple[float, object]:
+    start = time.perf_counter()
+
+    result = function()
+
+    return (time.perf_counter() - start) * 1000, result
+
+
+def exact(banner: str, level: int, pity: int, guaranteed: bool, fate_points: int) -> np.ndarray:
+    if banner == 'character':
+        return pulls_character(CharacterState(pity, 0, guaranteed).normalized, level)
+
+    return pulls_weapon(WeaponState(pity, 0, guaranteed, fate_points).normalized, level)
+
+
+def sample(banner: str, level: int, pity: int, guaranteed: bool, fate_points: int, samples: int, seed: int, executor: ProcessPoolExecutor) -> gacha.MonteCarloResult:
+    copies = level + 1 if banner == 'character' else level
+
+    return gacha.simulate_parallel(BANNERS[banner], copies, samples, pity, guaranteed, fate_points, seed, executor)
+
+
+def grid() -> list[tuple[str, int, int, bool, int]]:
+    queries = [('character', level, pity, guaranteed, 0) for level in range(7) for pity in CHARACTER_PITIES for guaranteed in (False, True)]
+
+    queries += [
+        ('weapon', level, pity, guaranteed, fate_points)
+        for level in range(1, 6) for pity in WEAPON_PITIES for guaranteed in (False, True) for fate_points in range(3)
+    ]
+
+    return queries
+
+
+def query_timings() -> list[dict]:
+    results = []
+
+    for banner, level, pity, guaranteed, fate_points in grid():
+        reset()
+
+        cold, distribution = timed(lambda: exact(banner, level, pity, guaranteed, fate_points))
+        warm, _ = timed(lambda: exact(banner, level, pity, guaranteed, fate_points))
+
+        results.append({
+            'banner': banner,
+            'level': level,
+            'pity': pity,
+            'guaranteed': guaranteed,
+            'fate_points': fate_points,
+            'cold_ms': cold,
+            'warm_ms': warm,
+            'length': len(distribution)
+        })
+
+    return results
+
+
+def engine_timings() -> dict[str, float]:
+    initial, goal = CharacterState(0, 0, False), CharacterState(0, 1, False)
+
+    timings = {}
+
+    timings['simulate_to_goal_ms'], final = timed(lambda: CharacterSimulation(initial).simulate_to_goal(goal))
+    timings['simulate_to_goal_packed_ms'], _ = timed(lambda: CharacterSimulation(initial, packed=True).simulate_to_goal(goal))
+    timings['simulate_to_goal_array_ms'], _ = timed(lambda: CharacterSimulation(initial).simulate_to_goal_array(goal))
+    timings['to_cumulative_ms'], _ = timed(lambda: to_cumulative(final))
+
+    reset()
+
+    distribution = pulls_character(initial, 6)
+    quantiles = Quantiles(cumulative(distribution), CHARACTER_SOLVER.maximum(initial, 7))
+
+    timings['get_quantiles_1000_ms'], _ = timed(lambda: quantiles.get_quantiles(np.linspace(0.001, 1.0, 1000)))
+    timings['get_pulls_needed_1000_ms'], _ = timed(lambda: quantiles.get_pulls_needed(np.linspace(0.001, 0.999, 1000)))
+    timings['plan_C6R5_ms'], _ = timed(lambda: pulls_plan(initial, WeaponState(0, 0, False, 0), ('C6', 'R5')))
+
+    return timings
+
+
+def memory() -> dict[str, float]:
+    reset()
+
+    tracemalloc.start()
+
+    for banner, level, pity, guaranteed, fate_points in grid():
+        exact(banner, level, pity, guaranteed, fate_points)
+
+    _, peak = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    usage = {'grid_peak_mb': peak / 2 ** 20}
+
+    try:
+        import resource
+    except ImportError:
+        return usage
+
+    # Kilobytes on Linux, bytes on macOS
+    scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+
+    usage['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+    return usage
+
+
+def accuracy(samples: int, seed: int) -> list[dict]:
+    results = []
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn')) as executor:
+        for check in CHECKS:
+            results.append(check_accuracy(check, samples, seed, executor))
+
+    return results
+
+
+def check_accuracy(check: tuple[str, int, int, bool, int], samples: int, seed: int, executor: ProcessPoolExecutor) -> dict:
+    """The batch Monte Carlo engine against the exact distribution, on the mean and on the whole CDF"""
+    banner, level, pity, guaranteed, fate_points = check
+
+    distribution = exact(*check)
+    pulls = np.arange(len(distribution), dtype=np.float64)
+
+    mean = float(distribution @ pulls)
+    deviation = float(np.sqrt(distribution @ (pulls - mean) ** 2))
+
+    drawn = sample(*check, samples, seed, executor)
+
+    exact_cdf = cumulative(distribution)
+    counts = np.zeros(len(distribution), dtype=np.float64)
+    counts[:min(len(drawn.histogram), len(distribution))] = drawn.histogram[:len(distribution)]
+
+    empirical = np.cumsum(counts) / samples
+
+    z = float((drawn.mean - mean) / (deviation / np.sqrt(samples)))
+    ks = float(np.abs(empirical - exact_cdf).max())
+
+    # Truncated tail mass can show up as extra distance, so it widens the bound
+    ks_bound = KS_CRITICAL / np.sqrt(samples) + float(1.0 - distribution.sum())
+
+    return {
+        'banner': banner,
+        'level': level,
+        'pity': pity,
+        'guaranteed': guaranteed,
+        'fate_points': fate_points,
+        'samples': samples,
+        'exact_mean': mean,
+        'sample_mean': drawn.mean,
+        'mean_z': z,
+        'ks': ks,
+        'ks_bound': float(ks_bound),
+        'passed': bool(abs(z) < MEAN_Z and ks < ks_bound)
+    }
+
+
+def dense(probabilities: dict[int, float]) -> np.ndarray:
+    return np.array([probabilities.get(i, 0.0) for i in range(max(probabilities) + 1)], dtype=np.float64)
+
+
+def consistency() -> list[dict]:
+    """The reference dict engine against the array engines, these should agree to rounding"""
+    initial, goal = CharacterState(33, 0, True), CharacterState(0, 2, False)
+
+    reference = CharacterSimulation(initial).simulate_to_goal(goal)
+    reference_array = dense(reference)
+
+    cumulative_reference = to_cumulative(reference)
+
+    results = []
+
+    for name, distribution in (
+        ('simulate_to_goal_array', CharacterSimulation(initial).simulate_to_goal_array(goal)),
+        ('simulate_to_goal_packed', dense(CharacterSimulation(initial, packed=True).simulate_to_goal(goal))),
+        ('renewal', exact('character', 1, 33, True, 0))
+    ):
+        length = max(len(distribution), len(reference_array))
+        difference = np.abs(np.pad(distribution, (0, length - len(distribution))) - np.pad(reference_array, (0, length - len(reference_array)))).max()
+
+        results.append({'engine': name, 'max_difference': float(difference), 'passed': bool(difference < 1e-6)})
+
+    cumulative_difference = max(abs(cumulative_reference[i] - value) for i, value in enumerate(cumulative(reference_array)) if i > 0)
+
+    results.append({'engine': 'to_cumulative', 'max_difference': float(cumulative_difference), 'passed': bool(cumulative_difference < 1e-12)})
+
+    return results
+
+
+@click.command()
+@click.option('-o', '--output', type=click.Path(dir_okay=False, writable=True), default=None, help='file to write the JSON report to, stdout by default')
+@click.option('-n', '--samples', type=click.IntRange(min=100), default=1_000_000, help='Monte Carlo samples per accuracy check')
+@click.option('--seed', type=int, default=0, help='seed for the Monte Carlo engine')
+@click.option('--skip-accuracy', is_flag=True, help='only run the timing and memory benchmarks')
+def benchmark(output: Optional[str], samples: int, seed: int, skip_accuracy: bool) -> None:
+    """Times cold and warm queries over the constellation, refinement and pity grid and cross checks the engines"""
+    report = {
+        'version': '.'.join(map(str, VERSION)),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'queries': query_timings(),
+        'engines': engine_timings(),
+        'memory': memory(),
+        'consistency': consistency()
+    }
+
+    if not skip_accuracy:
+        report['seed'] = seed
+        report['accuracy'] = accuracy(samples, seed)
+
+    report['passed'] = all(result['passed'] for result in report['consistency'] + report.get('accuracy', []))
+
+    data = json.dumps(report, indent=4)
+
+    if output is None:
+        click.echo(data)
+    else:
+        Path(output).write_text(data)
+
+    if not report['passed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,7 +1,11 @@
+import asyncio
 import importlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from inspect import getmembers
-from typing import Optional, Type, Any, Union, cast
+from typing import Optional, Type, Any, Union, Callable, TypeVar, cast
 
 import discord
 import discord.ext.commands as comms
@@ -18,6 +22,9 @@ __all__ = [
 ]
 
 
+R = TypeVar('R')
+
+
 class ArcBot(comms.Bot):
     def __init__(self, settings: Settings, passthrough: PassthroughInfo) -> None:
         super().__init__(command_prefix=comms.when_mentioned,
@@ -32,6 +39,12 @@ class ArcBot(comms.Bot):
 
         self.logger = logging.getLogger('arcueid')
 
+        self.executor = self.spawnExecutor()
+
+    def spawnExecutor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked so workers never inherit the running event loop or gateway sockets
+        return ProcessPoolExecutor(max_workers=self.settings.workers, mp_context=multiprocessing.get_context('spawn'))
+
     async def loadCogs(self, reload: bool = True) -> LoadedCogs:
         removed = set(self.cogs)
 
@@ -72,6 +85,48 @@ class ArcBot(comms.Bot):
                 return vc
         return None
 
+    async def compute(self, function: Callable[..., R], *args: Any, timeout: Optional[float] = None) -> R:
+        """Run a CPU bound function in the process pool, a timeout kills the pool's workers so the abandoned work stops with it
+
+        Other calls running on the killed pool are run again on its replacement within what is left of their own timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        while True:
+            executor = self.executor
+            remaining = deadline - loop.time() if deadline is not None else None
+
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError
+
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(executor, function, *args), remaining)
+            except asyncio.TimeoutError:
+                self.recycleExecutor(executor)
+
+                raise
+            except BrokenProcessPool:
+                if executor is self.executor:
+                    raise
+
+    def recycleExecutor(self, executor: ProcessPoolExecutor) -> None:
+        """Swaps in a fresh pool and terminates the workers of the old one, which would otherwise keep running timed out work"""
+        if executor is not self.executor:
+            # Already replaced when another call on the same pool timed out
+            return
+
+        self.executor = self.spawnExecutor()
+
+        # The pool has no public way to stop running work, terminating its workers breaks every call still waiting on it
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+
+        executor.shutdown(wait=False)
+
+        for process in processes:
+            process.terminate()
+
+        self.logger.warning(f'Computation timed out, terminated {len(processes)} workers')
+
     async def launch(self) -> None:
         await self.start(self.settings.token)
 
@@ -86,6 +141,8 @@ class ArcBot(comms.Bot):
 
         await super().close()
 
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
     def generateInviteURL(self, permissions: discord.Permissions, scopes: list[str]) -> str:
         scopeString = '%20'.join(scopes)
         return f'https://discord.com/api/oauth2/authorize?client_id={self.application.id}' \
@@ -9,6 +9,7 @@ from ..context import ArcContext
 from ..datastructures import ExitStatus, MessageData
 from ..helper import plural
 from ..reactiontree import pagignate
+from ..singleflight import FLIGHTS
 from .. import VERSION
 
 __all__ = [
@@ -51,6 +52,19 @@ class AdminCog(ACog):
 
         await self.bot.close()
 
+    @comms.command()
+    async def flights(self, ctx: ArcContext) -> None:
+        if len(FLIGHTS) == 0:
+            await ctx.replyEmbed('Single Flight Caches', 'No single flight caches are registered.')
+            return
+
+        embed = ctx.generateEmbed('Single Flight Caches', None)
+
+        for name, flight in sorted(FLIGHTS.items()):
+            embed.add_field(name=name, value=str(flight.stats), inline=False)
+
+        await ctx.reply(embed=embed)
+
     @comms.command()
     async def sync(self, ctx: ArcContext, onlyGuild: bool = False) -> None:
         message = await ctx.replyEmbed('Syncing', 'Syncing slash commands with Discord '
@@ -1,114 +1,65 @@
-from math import ceil, floor
-from typing import Optional
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+import multiprocessing
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
 
 import discord
 import discord.ext.commands as comms
 
 from .abc import ACog
 
+from ..banners import BANNERS, Banner
 from ..context import ArcContext
 from ..helper import plural
+from ..sheets import SheetsConnection, StaleCache
+from ..spending import SpendingStore
+from ..topup import UNITS, convert, format_units
 
-import pygsheets
+import numpy as np
 
 import random
-import statistics
 
 
 __all__ = [
     'GachaCog'
 ]
 
-class CharacterSimulation:
-    def __init__(self, starting_pity: int = 0, starting_guaranteed: bool = False) -> None:
-        self.won_5050 = not starting_guaranteed
-        self.pull_number = self.total = self.starting = starting_pity
-
-    @property
-    def probability(self) -> float:
-        if self.pull_number < 74:
-            return 0.006
-        if self.pull_number >= 90:
-            return 1
-        else:
-            return 0.006 + 0.06 * (self.pull_number - 73)
-
-    def pull(self) -> tuple[bool, bool]:
-        self.pull_number += 1
-        self.total += 1
-
-        if random.random() < self.probability:
-            if self.won_5050:
-                return True, random.random() < 0.5
-            else:
-                return True, True
-        else:
-            return False, False
-
-    def c(self, n: int) -> int:
-        copies = 0
-
-        while copies < n + 1:
-            five_star, correct = self.pull()
-
-            if five_star:
-                self.pull_number = 0
-
-                if correct:
-                    copies += 1
-                    self.won_5050 = True
-                else:
-                    self.won_5050 = False
-        
-        return self.total - self.starting
-
-
-class WeaponSimulation:
-    def __init__(self, pity: int, lost_previous_75_25: bool, fate_points: int) -> None:
+class BannerSimulation:
+    def __init__(self, banner: Banner, pity: int = 0, guaranteed: bool = False, fate_points: int = 0) -> None:
+        self.banner = banner
         self.total_pulls = 0
         self.pity = pity
-        self.lost_previous_75_25 = lost_previous_75_25
+        self.guaranteed = guaranteed
         self.fate_points = fate_points
-    
+
     @property
     def probability(self) -> float:
-        return min(1, 0.007 + 0.07 * max(0, self.pity - 62))
-    
-    def pull(self) -> bool:
-        five_star, target = False, False
+        return self.banner.rate(self.pity)
 
-        if random.random() < self.probability:  # is a 5 star
-            five_star = True
-            if self.fate_points >= 2:  # guaranteed is target
-                target = True
-            else:
-                if self.lost_previous_75_25:  # is a 50 / 50 for the target one
-                    target = random.random() < 0.5
-                    self.lost_previous_75_25 = False
-                else:  # is a 75 / 25 for a 50 / 50
-                    if random.random() < 0.75:  # is a 50 / 50 now
-                        target = random.random() < 0.5
-                        self.lost_previous_75_25 = False
-                    else:
-                        self.lost_previous_75_25 = True
+    def pull(self) -> bool:
+        five_star = random.random() < self.probability
 
         self.pity += 1
         self.total_pulls += 1
 
-        if five_star:
-            self.pity = 0
+        if not five_star:
+            return False
 
-            if target:
-                self.fate_points = 0
-            else:
-                self.fate_points += 1
+        outcome = self.banner.draw(self.guaranteed, self.fate_points, random.random())
 
-        return five_star and target
-    
-    def r(self, copies: int) -> int:
+        self.pity = 0
+        self.guaranteed = outcome.guaranteed
+        self.fate_points = outcome.fate_points
+
+        return outcome.target
+
+    def copies(self, n: int) -> int:
         current = 0
 
-        while current < copies:
+        while current < n:
             if self.pull():
                 current += 1
 
@@ -116,121 +67,417 @@ class WeaponSimulation:
 
 
 def c(n: int, starting_pity: int, lost_previous_50_50: bool) -> int:
-    sim = CharacterSimulation(starting_pity, lost_previous_50_50)
-    return sim.c(n)
+    sim = BannerSimulation(BANNERS["character"], starting_pity, lost_previous_50_50)
+    return sim.copies(n + 1)
 
 def r(n: int, starting_pity: int, lost_previous_75_25: bool, fate_points: int) -> int:
-    sim = WeaponSimulation(starting_pity, lost_previous_75_25, fate_points)
-    return sim.r(n)
+    sim = BannerSimulation(BANNERS["weapon"], starting_pity, lost_previous_75_25, fate_points)
+    return sim.copies(n)
 
 
-def optimal(pulls: int) -> float:
-    primos = pulls * 160
-    total = 0.0
+def simulate_batch(banner: Banner, copies: int, trials: int, pity: int = 0, guaranteed: bool = False, fate_points: int = 0, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Pulls needed for the given number of copies in each of many independent trials, run together as arrays"""
+    if pity < 0:
+        raise ValueError(f"Pity must not be negative, got {pity}")
 
-    for gained, cost in [(6480+1600, 99.99), (3280+600, 49.99), (1980+260, 29.99), (980+110, 14.99), (300+30, 4.99)]:
-        amount = primos // gained
+    if not 0 <= fate_points <= (banner.spec.fate_points or 0):
+        raise ValueError(f"Fate points must be between 0 and {banner.spec.fate_points or 0}, got {fate_points}")
 
-        total += amount * cost
-        primos -= amount * gained
-    
-    total += ceil(primos / 60) * 0.99
+    rng = rng if rng is not None else np.random.default_rng()
+
+    pities = np.full(trials, min(pity, banner.certain), dtype=np.int64)
+    guarantees = np.full(trials, guaranteed, dtype=bool)
+    fates = np.full(trials, banner.key(guaranteed, fate_points)[1], dtype=np.int64)
+
+    found = np.zeros(trials, dtype=np.int64)
+    pulls = np.zeros(trials, dtype=np.int64)
+
+    active = np.arange(trials) if copies > 0 else np.arange(0)
+
+    # Every unfinished trial jumps straight to its next five star, an exponential draw against the cumulative hazard picks the pity it lands on
+    while len(active) > 0:
+        thresholds = banner.hazard[pities[active]] + rng.standard_exponential(len(active))
+        landed = np.searchsorted(banner.hazard, thresholds, side='right') - 1
+
+        pulls[active] += landed - pities[active] + 1
+
+        g, f = guarantees[active].astype(np.intp), fates[active]
+        outcome = (rng.random(len(active))[:, None] >= banner.outcome_bounds[g, f]).sum(axis=1)
+
+        found[active] += banner.outcome_target[g, f, outcome]
+        guarantees[active] = banner.outcome_guaranteed[g, f, outcome]
+        fates[active] = banner.outcome_fate_points[g, f, outcome]
+        pities[active] = 0
+
+        active = active[found[active] < copies]
+
+    return pulls
+
+
+# Trials per independently seeded chunk, fixed so a seed gives the same histogram on any number of workers
+CHUNK_TRIALS = 100_000
+
+
+@dataclass(frozen=True)
+class MonteCarloResult:
+    seed: int
+    # Number of trials by pulls needed
+    histogram: np.ndarray
+
+    @property
+    def trials(self) -> int:
+        return int(self.histogram.sum())
+
+    @property
+    def mean(self) -> float:
+        return float(self.histogram @ np.arange(len(self.histogram))) / self.trials
+
+    @property
+    def stdev(self) -> float:
+        pulls = np.arange(len(self.histogram))
+
+        return float(np.sqrt(self.histogram @ (pulls - self.mean) ** 2 / (self.trials - 1)))
+
+    def quantiles(self, quantiles: np.ndarray) -> np.ndarray:
+        return np.searchsorted(np.cumsum(self.histogram), np.asarray(quantiles) * self.trials, side='left')
+
+
+def seed_chunks(trials: int, seed: Optional[int] = None) -> tuple[int, list[tuple[int, np.random.SeedSequence]]]:
+    """Splits trials into chunks, each with its own stream spawned from the seed, a random seed is drawn when none is given"""
+    sequence = np.random.SeedSequence(seed)
+
+    sizes = [min(CHUNK_TRIALS, trials - start) for start in range(0, trials, CHUNK_TRIALS)]
+
+    return sequence.entropy, list(zip(sizes, sequence.spawn(len(sizes))))
+
+
+def simulate_chunk(banner: Banner, copies: int, trials: int, pity: int, guaranteed: bool, fate_points: int, seed: np.random.SeedSequence) -> np.ndarray:
+    return np.bincount(simulate_batch(banner, copies, trials, pity, guaranteed, fate_points, np.random.default_rng(seed)))
+
+
+def merge_histograms(histograms: list[np.ndarray]) -> np.ndarray:
+    merged = np.zeros(max((len(histogram) for histogram in histograms), default=0), dtype=np.int64)
+
+    for histogram in histograms:
+        merged[:len(histogram)] += histogram
+
+    return merged
+
+
+def simulate_parallel(banner: Banner, copies: int, trials: int, pity: int = 0, guaranteed: bool = False, fate_points: int = 0, seed: Optional[int] = None, executor: Optional[Executor] = None) -> MonteCarloResult:
+    """Batch Monte Carlo split across a process pool, the returned seed reproduces the histogram exactly"""
+    seed, chunks = seed_chunks(trials, seed)
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn')) as pool:
+            return simulate_parallel(banner, copies, trials, pity, guaranteed, fate_points, seed, pool)
+
+    futures = [executor.submit(simulate_chunk, banner, copies, size, pity, guaranteed, fate_points, sequence) for size, sequence in chunks]
+
+    return MonteCarloResult(seed, merge_histograms([future.result() for future in futures]))
+
+
+class RunningStats:
+    """Moments of the converted values merged chunk by chunk, alongside a histogram of pulls needed"""
+    def __init__(self) -> None:
+        self.histogram = np.zeros(0, dtype=np.int64)
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, histogram: np.ndarray, values: np.ndarray) -> None:
+        """Adds a chunk's histogram, values gives the converted value of each pull count"""
+        self.histogram = merge_histograms([self.histogram, histogram])
+
+        count = int(histogram.sum())
+        mean = float(histogram @ values[:len(histogram)]) / count
+        m2 = float(histogram @ (values[:len(histogram)] - mean) ** 2)
 
-    return total
+        # Chan et al. pairwise update, exact whatever the chunk sizes
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    @property
+    def stdev(self) -> float:
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    def mean_interval(self, z: float) -> float:
+        """Half width of the confidence interval around the mean"""
+        return z * self.stdev / np.sqrt(self.count)
+
+    def quantiles(self, quantiles: np.ndarray) -> np.ndarray:
+        return np.minimum(np.searchsorted(np.cumsum(self.histogram), np.asarray(quantiles) * self.count, side='left'), len(self.histogram) - 1)
+
+    def quantile_intervals(self, quantiles: np.ndarray, z: float) -> tuple[np.ndarray, np.ndarray]:
+        """Distribution free bounds on each quantile from the binomial spread of the order statistics"""
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        spread = z * np.sqrt(quantiles * (1 - quantiles) / self.count)
+
+        return self.quantiles(np.clip(quantiles - spread, 0.0, 1.0)), self.quantiles(np.clip(quantiles + spread, 0.0, 1.0))
+
+
+BANNER_TYPES = ["Character", "Weapon"]
+
+PERCENTILES = (10, 20, 30, 40, 50, 60, 70, 80, 90, 99)
+
+# The most trials a streamed estimate runs, the same seed always stops at the same chunk
+STREAM_TRIALS = 4_000_000
+# Seconds one wave of chunks may take before the stream gives up
+STREAM_DURATION = 30.0
+EDIT_INTERVAL = 2.0
+
+# 95% intervals, converged once the mean is known to the precision it is shown at and percentiles to the pull
+CONFIDENCE_Z = 1.96
+
+
+def unit_values(units: str, length: int) -> np.ndarray:
+    return convert(units, np.arange(length))
+
+
+def converged(stats: RunningStats, units: str) -> bool:
+    if stats.count == 0:
+        return False
+
+    lower, upper = stats.quantile_intervals(np.array(PERCENTILES) / 100, CONFIDENCE_Z)
+
+    # The interval rounds to nothing at the displayed precision
+    precise = format_units(units, stats.mean_interval(CONFIDENCE_Z)) == format_units(units, 0.0)
+
+    return precise and bool(np.all(upper - lower <= 1))
+
+
+# Seconds the local mirror of the spending sheet is trusted before the next call syncs it in the background
+SPENT_TTL = 60.0
+
+
+# Seconds a command waits on a pending Google authorization before giving up
+AUTHORIZE_WAIT = 5.0
+
+SPENDING_DATABASE = 'spending.sqlite3'
+
+
+R = TypeVar('R')
 
 
 class GachaCog(ACog):
     async def __ainit__(self) -> None:
-        self.gc = pygsheets.authorize(service_file=self.bot.settings.google_credentials)
+        # Authorization runs in the background so loading cogs never waits on Google
+        self.sheets = SheetsConnection(self.bot.settings.google_credentials, self.logger)
+        self.sheets.start()
+
+        self.store = SpendingStore(Path(self.bot.settings.cache_directory) / SPENDING_DATABASE)
+        self.synced: StaleCache[bool] = StaleCache(SPENT_TTL, self.sync, self.logger)
+
+    def cog_unload(self) -> None:
+        self.sheets.close()
+        self.store.close()
+
+    async def sync(self) -> bool:
+        client = await self.sheets.client(AUTHORIZE_WAIT)
+
+        return await self.store.call(self.store.sync, client)
+
+    async def local(self, query: Callable[..., R], *args: Any) -> R:
+        """Answers a query from the local mirror, only the very first query waits on the sheet and later ones sync behind it"""
+        if await self.store.call(self.store.synced) is None:
+            await self.synced.get()
+        elif self.synced.stale:
+            self.synced.refresh()
 
-        print(self.gc)
+        return await self.store.call(query, *args)
 
-    @comms.command()
+    async def spending(self, ctx: ArcContext, query: Callable[..., R], *args: Any) -> Optional[R]:
+        try:
+            return await self.local(query, *args)
+        except asyncio.TimeoutError:
+            await ctx.replyEmbed("Sheet Unavailable", "Still connecting to Google Sheets, please try again shortly", error=True)
+        except Exception:
+            self.logger.exception("Failed to read the spending sheet")
+
+            await ctx.replyEmbed("Sheet Unavailable", "The spending sheet could not be read, please try again later", error=True)
+
+        return None
+
+    @comms.group(invoke_without_command=True)
     async def spent(self, ctx: ArcContext) -> None:
-        sheet = self.gc.open_by_key("175PMTH9KkWQfL08VLPvrZaBJfeFArToYZztikW2ky1U")
+        async with ctx.typing():
+            summary = await self.spending(ctx, self.store.summary)
+
+        if summary is None:
+            return
+
+        embed = ctx.generateEmbed("Money Spent on Gacha", f"<@186185272302501888> has spent {summary.total} on gacha.")
+
+        embed.add_field(name="Total", value=summary.total)
+        embed.add_field(name="Total Time", value=f"{summary.duration} weeks")
+        embed.add_field(name="Per Day", value=summary.per_day)
+
+        await ctx.reply(embed=embed)
 
-        summary: pygsheets.Worksheet = sheet.worksheet()
+    @spent.command()
+    async def monthly(self, ctx: ArcContext, months: int = 12) -> None:
+        if not 1 <= months <= 25:
+            await ctx.replyEmbed("Invalid Months", "Months must be between 1 and 25", error=True)
+            return
 
-        total = summary.get_value("B1")
-        per_day = summary.get_value("B2")
-        duration = summary.get_value("B4")
+        async with ctx.typing():
+            history = await self.spending(ctx, self.store.monthly, months)
 
-        embed = ctx.generateEmbed("Money Spent on Gacha", f"<@186185272302501888> has spent {total} on gacha.")
+        if history is None:
+            return
 
-        embed.add_field(name="Total", value=total)
-        embed.add_field(name="Total Time", value=f"{duration} weeks")
-        embed.add_field(name="Per Day", value=per_day)
+        if len(history) == 0:
+            await ctx.replyEmbed("Monthly Spending", "No purchases have been logged yet.")
+            return
+
+        embed = ctx.generateEmbed("Monthly Spending", f"Spending over the last {plural(len(history), 'month', 'months')} with purchases.")
+
+        for month in history:
+            embed.add_field(name=month.month, value=f"${month.amount:,.2f} over {plural(month.purchases, 'purchase', 'purchases')}")
 
         await ctx.reply(embed=embed)
-    
-    # @comms.hybrid_command()
-    # async def pulls_old(self, ctx: ArcContext,
-    #     copies: int = comms.parameter(default=1, description="the target constellation level of the character"),
-    #     starting_pity: int = comms.parameter(default=0, description="the pity you start at"),
-    #     lost_previous: bool = comms.parameter(default=False, description="whether or not the previous 50/50 or 75/25 was lost"),
-    #     units: str = comms.parameter(default="Pulls", description="what units to return the data in"),
-    #     banner: str = comms.parameter(default="Character", description="which banner type to simulate"),
-    #     fate_points: int = comms.parameter(default=0, description="the number of fate points you start with, useless with regards to the character banner")) -> None:
-    #     """Calculates the number of pulls to obtain a specific constellation level of a 5* character"""
-    #     if units not in ["Pulls", "Optimal USD", "Minimal USD"]:
-    #         await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type.")
-    #         return
-
-    #     if banner not in ["Character", "Weapon"]:
-    #         await ctx.replyEmbed("Invalid Banner", f"{banner} is not a valid banner.")
-    #         return
-
-    #     match banner:
-    #         case "Weapon":
-    #             copies = min(max(copies, 1), 5)
-    #         case "Character":
-    #             copies = min(max(copies, 1), 7)
-
-    #     def convert(value: int) -> float:
-    #         match units:
-    #             case "Pulls":
-    #                 return float(value)
-    #             case "Minimal USD":
-    #                 return optimal(value)
-    #             case "Optimal USD":
-    #                 return 99.99 * value * 160 / 8080
-    #         return -1
-
-    #     async with ctx.typing():
-    #         match banner:
-    #             case "Character":
-    #                 data = [convert(c(copies - 1, starting_pity, lost_previous)) for _ in range(10000)]
-    #             case "Weapon":
-    #                 data = [convert(r(copies, starting_pity, lost_previous, fate_points)) for _ in range(10000)]
-    #             case _:
-    #                 data = []
-
-    #         lines = []
-
-    #         lines.append(f"Average: {sum(data) / len(data):.2f}")
-    #         lines.append(f"Standard Deviation: {statistics.stdev(data):.2f}")
-    #         lines.append(f"Percentiles:")
-
-    #         for i, value in enumerate(statistics.quantiles(data, n=10)):
-    #             lines.append(f"    {(i + 1) * 10}: {value:.2f}")
-
-    #         lines.append(f"    99: {statistics.quantiles(data, n=100)[-1]:.2f}")
-
-    #         block = '\n'.join(lines)
-
-    #         await ctx.replyEmbed(f"Pulls to get **{copies}** copies on the {banner} banner", f"Copies: **{copies}**, Banner: **{banner}**, Starting Pity: **{starting_pity}**, Guaranteed: **{lost_previous}**, Units: **{units}**, Fate Points: **{fate_points}**\n```{block}```")
-    
-    # @pulls_old.autocomplete('units')
-    # async def units_autocomplete(self, interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
-    #     choices = ["Pulls", "Optimal USD", "Minimal USD"]
 
-    #     return [discord.app_commands.Choice(name=choice, value=choice) for choice in choices if current.lower() in choice.lower()]
+    @spent.command()
+    async def recent(self, ctx: ArcContext, count: int = 10) -> None:
+        if not 1 <= count <= 25:
+            await ctx.replyEmbed("Invalid Count", "Count must be between 1 and 25", error=True)
+            return
+
+        async with ctx.typing():
+            purchases = await self.spending(ctx, self.store.recent, count)
+
+        if purchases is None:
+            return
+
+        if len(purchases) == 0:
+            await ctx.replyEmbed("Recent Purchases", "No purchases have been logged yet.")
+            return
+
+        embed = ctx.generateEmbed("Recent Purchases", f"The last {plural(len(purchases), 'purchase', 'purchases')} logged.")
+
+        for purchase in purchases:
+            embed.add_field(name=f"{purchase.date} ${purchase.amount:,.2f}", value=purchase.description or "No description", inline=False)
+
+        await ctx.reply(embed=embed)
     
-    # @pulls_old.autocomplete('banner')
-    # async def banner_autocomplete(self, interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
-    #     choices = ["Character", "Weapon"]
+    @comms.hybrid_command()
+    async def pulls_old(self, ctx: ArcContext,
+        copies: int = comms.parameter(default=1, description="the target constellation level of the character"),
+        starting_pity: int = comms.parameter(default=0, description="the pity you start at"),
+        lost_previous: bool = comms.parameter(default=False, description="whether or not the previous 50/50 or 75/25 was lost"),
+        units: str = comms.parameter(default="Pulls", description="what units to return the data in"),
+        banner: str = comms.parameter(default="Character", description="which banner type to simulate"),
+        fate_points: int = comms.parameter(default=0, description="the number of fate points you start with, useless with regards to the character banner"),
+        seed: Optional[str] = comms.parameter(default=None, description="the seed to reproduce a previous run with")) -> None:
+        """Estimates the number of pulls to obtain a number of copies of a 5* by Monte Carlo, refined until it converges"""
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type.")
+            return
+
+        if banner not in BANNER_TYPES:
+            await ctx.replyEmbed("Invalid Banner", f"{banner} is not a valid banner.")
+            return
+
+        if starting_pity < 0:
+            await ctx.replyEmbed("Invalid Starting Pity", "Input a valid starting pity", error=True)
+            return
+
+        if not 0 <= fate_points <= BANNERS["weapon"].spec.fate_points:
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        # Seeds are 128 bit, beyond what a slash command integer can carry
+        if seed is not None and not seed.isdigit():
+            await ctx.replyEmbed("Invalid Seed", f"{seed} is not a valid seed.")
+            return
+
+        match banner:
+            case "Weapon":
+                copies = min(max(copies, 1), 5)
+            case "Character":
+                copies = min(max(copies, 1), 7)
+                # The character banner has no fate path
+                fate_points = 0
+
+        title = f"Pulls to get **{copies}** copies on the {banner} banner"
+        header = f"Copies: **{copies}**, Banner: **{banner}**, Starting Pity: **{starting_pity}**, Guaranteed: **{lost_previous}**, Units: **{units}**, Fate Points: **{fate_points}**"
+
+        message = await ctx.replyEmbed(title, f"{header}\nSimulating...")
+
+        seed, chunks = seed_chunks(STREAM_TRIALS, int(seed) if seed is not None else None)
+        stats = RunningStats()
+
+        loop = asyncio.get_running_loop()
+        edited = loop.time()
+        timed_out = False
+
+        def summary(done: bool) -> str:
+            values = unit_values(units, len(stats.histogram))
+
+            lines = []
+
+            lines.append(f"Average: {format_units(units, stats.mean)} ± {format_units(units, stats.mean_interval(CONFIDENCE_Z))}")
+            lines.append(f"Standard Deviation: {format_units(units, stats.stdev)}")
+            lines.append("Percentiles:")
+
+            for percentile, pulls in zip(PERCENTILES, stats.quantiles(np.array(PERCENTILES) / 100)):
+                lines.append(f"    {percentile}: {values[pulls]:.2f}" if units != "Pulls" else f"    {percentile}: {pulls}")
+
+            block = '\n'.join(lines)
+
+            if not done:
+                status = "Simulating"
+            elif converged(stats, units):
+                status = "Converged"
+            else:
+                status = "Timed out" if timed_out else "Stopped"
+
+            return f"{header}\n```{block}```\n{status} after {stats.count:,} trials, seed `{seed}`"
+
+        # A wave of chunks per worker at a time, merged in chunk order so the seed reproduces the same numbers
+        for start in range(0, len(chunks), self.bot.settings.workers):
+            wave = chunks[start:start + self.bot.settings.workers]
+
+            try:
+                histograms = await asyncio.gather(*(
+                    self.bot.compute(simulate_chunk, BANNERS[banner.lower()], copies, size, starting_pity, lost_previous, fate_points, sequence, timeout=STREAM_DURATION)
+                    for size, sequence in wave
+                ))
+            except asyncio.TimeoutError:
+                timed_out = True
+                break
+
+            # Checked after every chunk in chunk order, so the seed decides where it stops whatever the number of workers
+            for histogram in histograms:
+                if not converged(stats, units):
+                    stats.add(histogram, unit_values(units, len(histogram)))
+
+            if converged(stats, units):
+                break
+
+            if loop.time() - edited > EDIT_INTERVAL:
+                await message.edit(embed=ctx.generateEmbed(title, summary(False)))
+
+                edited = loop.time()
+
+        if stats.count == 0:
+            await message.edit(embed=ctx.generateEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True))
+            return
+
+        await message.edit(embed=ctx.generateEmbed(title, summary(True)))
+
+    @pulls_old.autocomplete('units')
+    async def units_autocomplete(self, interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
+        return [discord.app_commands.Choice(name=choice, value=choice) for choice in UNITS if current.lower() in choice.lower()]
 
-    #     return [discord.app_commands.Choice(name=choice, value=choice) for choice in choices if current.lower() in choice.lower()]
+    @pulls_old.autocomplete('banner')
+    async def banner_autocomplete(self, interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
+        return [discord.app_commands.Choice(name=choice, value=choice) for choice in BANNER_TYPES if current.lower() in choice.lower()]
 
     @property
     def color(self) -> Optional[discord.Color]:
@@ -1,18 +1,30 @@
 from abc import ABC, abstractmethod
-import bisect
-from collections import defaultdict
-from dataclasses import dataclass
-from typing import Generic, Mapping, TypeVar
-
-from functools import lru_cache
+import asyncio
+from collections import defaultdict, OrderedDict
+from dataclasses import dataclass, fields
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Callable, ClassVar, Generic, Hashable, Mapping, Sequence, TypeVar
+
+from functools import cached_property, lru_cache, reduce
 from itertools import count
 
+import aiohttp
+import numpy as np
+
 import discord
 import discord.ext.commands as comms
 
 from .abc import ACog
 
 from ..context import ArcContext
+from ..banners import BANNERS, Banner
+from ..singleflight import SingleFlight
+from ..topup import UNITS, convert, format_units
+from ..wishes import CHUNK_SIZE, PoolState, WishStore, pool_states
 
 __all__ = [
     "GenshinCog"
@@ -20,20 +32,270 @@ __all__ = [
 
 
 class SimulationState(ABC):
+    # Dataclass states opt in to packed simulation by listing (field, bit width) pairs, lowest bits first
+    BITS: ClassVar[tuple[tuple[str, int], ...]] = ()
+
     def meets_goal(self, goal: "SimulationState") -> bool:
         ...
 
+    def pack(self) -> int:
+        code = 0
+        shift = 0
+
+        for name, bits in self.BITS:
+            value = int(getattr(self, name))
+
+            if not 0 <= value < 1 << bits:
+                raise OverflowError(f"{name} of {value} does not fit in {bits} bits")
+
+            code |= value << shift
+            shift += bits
+
+        return code
+
+    @classmethod
+    def unpack(cls, code: int) -> "SimulationState":
+        types = {field.name: field.type for field in fields(cls)}
+        values = {}
+
+        for name, bits in cls.BITS:
+            values[name] = types[name](code & ((1 << bits) - 1))
+            code >>= bits
+
+        return cls(**values)
+
+    @property
+    def normalized(self) -> "SimulationState":
+        """An equivalent state shared by every state with the same future"""
+        return self
+
+    @property
+    def carried(self) -> "SimulationState":
+        """The state a following banner starts from, progress towards the goal is reset"""
+        return self
+
 
 T = TypeVar("T", bound=SimulationState)
 
 
+class TransitionMatrix(Generic[T]):
+    """Sparse transition matrix over the integer indexed states reachable from a set of initial states."""
+    def __init__(self, simulation: "Simulation[T]", initial: list[T], goal: T) -> None:
+        self.states: list[T] = list(initial)
+        self.indices: dict[T, int] = {state: i for i, state in enumerate(self.states)}
+
+        sources: list[int] = []
+        destinations: list[int] = []
+        probabilities: list[float] = []
+
+        source = 0
+
+        while source < len(self.states):
+            state = self.states[source]
+
+            # Goal states are absorbing, leaving them without outgoing edges drops their mass after one step
+            if not state.meets_goal(goal):
+                for next_state, probability in simulation.transition(state).items():
+                    if probability <= 0:
+                        continue
+
+                    if next_state not in self.indices:
+                        self.indices[next_state] = len(self.states)
+                        self.states.append(next_state)
+
+                    sources.append(source)
+                    destinations.append(self.indices[next_state])
+                    probabilities.append(probability)
+
+            source += 1
+
+        self.sources = np.array(sources, dtype=np.intp)
+        self.destinations = np.array(destinations, dtype=np.intp)
+        self.probabilities = np.array(probabilities, dtype=np.float64)
+
+        self.absorbing = np.array([state.meets_goal(goal) for state in self.states], dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def vector(self, states: Mapping[T, float]) -> np.ndarray:
+        vector = np.zeros(len(self.states), dtype=np.float64)
+
+        for state, probability in states.items():
+            if probability > 0:
+                vector[self.indices[state]] += probability
+
+        return vector
+
+    def step(self, vector: np.ndarray) -> np.ndarray:
+        return np.bincount(self.destinations, weights=vector[self.sources] * self.probabilities, minlength=len(self.states))
+
+    def absorption(self, vector: np.ndarray, precision: float = 0.0) -> tuple[np.ndarray, float]:
+        """Absorption times and the unabsorbed mass dropped once it fell to the given precision"""
+        final = []
+
+        while vector.any():
+            final.append(vector[self.absorbing].sum())
+
+            remaining = vector[~self.absorbing].sum()
+
+            if remaining <= precision:
+                return np.array(final, dtype=np.float64), remaining
+
+            vector = self.step(vector)
+
+        return np.array(final, dtype=np.float64), 0.0
+
+    def success(self, pulls: Sequence[int]) -> np.ndarray:
+        """Chance of having met the goal within each pull count for every state, one row each, from one backward pass shared by all states
+
+        Only the rows asked for are kept, the pass itself holds a single row at a time."""
+        value = self.absorbing.astype(np.float64)
+
+        wanted = set(pulls)
+        rows = {0: value} if 0 in wanted else {}
+
+        for step in range(1, max(pulls, default=0) + 1):
+            value = np.bincount(self.sources, weights=self.probabilities * value[self.destinations], minlength=len(self.states))
+            value[self.absorbing] = 1.0
+
+            if step in wanted:
+                rows[step] = value
+
+        return np.array([rows[count] for count in pulls]).reshape(len(pulls), len(self.states))
+
+    def absorption_joint(self, vector: np.ndarray, precision: float = 0.0) -> tuple[dict[T, np.ndarray], float]:
+        """Joint distribution of absorption time and the goal state absorbed into"""
+        absorbing = np.flatnonzero(self.absorbing)
+
+        final = []
+        error = 0.0
+
+        while vector.any():
+            final.append(vector[absorbing])
+
+            remaining = vector[~self.absorbing].sum()
+
+            if remaining <= precision:
+                error = remaining
+                break
+
+            vector = self.step(vector)
+
+        columns = np.array(final, dtype=np.float64).reshape(len(final), len(absorbing)).T
+
+        return {self.states[index]: np.trim_zeros(column, "b") for index, column in zip(absorbing, columns) if column.any()}, error
+
+
+class PackedTable(Generic[T]):
+    """Transitions of a packed state space indexed directly by state code, each code is expanded the first time it is reached."""
+    def __init__(self, simulation: "Simulation[T]", state_type: type[T]) -> None:
+        self.simulation = simulation
+        self.state_type = state_type
+
+        self.size = 1 << sum(bits for _, bits in state_type.BITS)
+
+        self.expanded = np.zeros(self.size, dtype=bool)
+        self.targets = np.zeros((self.size, 1), dtype=np.intp)
+        self.probabilities = np.zeros((self.size, 1), dtype=np.float64)
+
+        # goal -> (known, meets) over every code
+        self.goals: dict[T, tuple[np.ndarray, np.ndarray]] = {}
+
+    def encode(self, states: Mapping[T, float]) -> tuple[np.ndarray, np.ndarray]:
+        live = [(state.pack(), probability) for state, probability in states.items() if probability > 0]
+
+        vector = np.bincount([code for code, _ in live], weights=[probability for _, probability in live], minlength=self.size)
+        codes = np.flatnonzero(vector)
+
+        return codes, vector[codes]
+
+    def decode(self, codes: np.ndarray, probabilities: np.ndarray) -> defaultdict[T, float]:
+        states: defaultdict[T, float] = defaultdict(float)
+
+        for code, probability in zip(codes.tolist(), probabilities.tolist()):
+            states[self.state_type.unpack(code)] = probability
+
+        return states
+
+    def expand(self, codes: np.ndarray) -> None:
+        for code in codes[~self.expanded[codes]].tolist():
+            outputs = [(next_state.pack(), probability) for next_state, probability in self.simulation.transition(self.state_type.unpack(code)).items()]
+
+            if len(outputs) > self.targets.shape[1]:
+                padding = ((0, 0), (0, len(outputs) - self.targets.shape[1]))
+
+                self.targets = np.pad(self.targets, padding)
+                self.probabilities = np.pad(self.probabilities, padding)
+
+            for column, (target, probability) in enumerate(outputs):
+                self.targets[code, column] = target
+                self.probabilities[code, column] = probability
+
+            self.expanded[code] = True
+
+    def meets(self, goal: T, codes: np.ndarray) -> np.ndarray:
+        if goal not in self.goals:
+            self.goals[goal] = (np.zeros(self.size, dtype=bool), np.zeros(self.size, dtype=bool))
+
+        known, meets = self.goals[goal]
+
+        for code in codes[~known[codes]].tolist():
+            meets[code] = self.state_type.unpack(code).meets_goal(goal)
+            known[code] = True
+
+        return meets[codes]
+
+    def step(self, codes: np.ndarray, probabilities: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        self.expand(codes)
+
+        # Unused columns point at code 0 with no weight
+        flow = self.probabilities[codes] * probabilities[:, None]
+        vector = np.bincount(self.targets[codes].ravel(), weights=flow.ravel(), minlength=self.size)
+        codes = np.flatnonzero(vector)
+
+        return codes, vector[codes]
+
+
+# Shared by every simulation with the same rule
+PACKED_TABLES: dict[Hashable, PackedTable] = {}
+
+
 class Simulation(ABC, Generic[T]):
-    def __init__(self, initial: T) -> None:
+    def __init__(self, initial: T, precision: float = 0.0, packed: bool = False) -> None:
         self.states = defaultdict(float)
 
         self.states[initial] = 1.0
-    
+
+        # Simulations stop once no more than precision of the mass is left unabsorbed, error bounds every reported probability
+        self.precision = precision
+        self.error = 0.0
+
+        # Packed simulations walk integer codes through a shared table instead of state objects, the state must declare BITS
+        if packed and not initial.BITS:
+            raise TypeError(f"{type(initial).__name__} does not declare BITS and cannot be packed")
+
+        self.packed = packed
+        self.state_type = type(initial)
+
+    @property
+    def rule(self) -> Hashable:
+        """Simulations with the same rule share transitions and so a packed table"""
+        return type(self)
+
+    @property
+    def table(self) -> PackedTable[T]:
+        key = self.rule, self.state_type
+
+        if key not in PACKED_TABLES:
+            PACKED_TABLES[key] = PackedTable(self, self.state_type)
+
+        return PACKED_TABLES[key]
+
     def simulate_to_goal(self, goal: T) -> Mapping[int, float]:
+        if self.packed:
+            return self.simulate_to_goal_packed(goal)
+
         final = defaultdict(float)
 
         for i in count():
@@ -41,20 +303,91 @@ class Simulation(ABC, Generic[T]):
                 break
 
             next_states: defaultdict[T, float] = defaultdict(float)
+            remaining = 0.0
 
             for state, probability in self.states.items():
                 if probability > 0:
                     if state.meets_goal(goal):
                         final[i] += probability
                     else:
+                        remaining += probability
+
                         for next_state, other_probability in self.transition(state).items():
                             next_states[next_state] += probability * other_probability
             
             self.states = next_states
+
+            if self.precision > 0 and remaining <= self.precision:
+                self.error += remaining
+                self.states = defaultdict(float)
         
         return final
+
+    def simulate_to_goal_packed(self, goal: T) -> Mapping[int, float]:
+        table = self.table
+        codes, probabilities = table.encode(self.states)
+
+        final = defaultdict(float)
+
+        for i in count():
+            if len(codes) == 0:
+                break
+
+            meets = table.meets(goal, codes)
+
+            if meets.any():
+                final[i] += probabilities[meets].sum()
+
+            remaining = probabilities[~meets].sum()
+            codes, probabilities = table.step(codes[~meets], probabilities[~meets])
+
+            if self.precision > 0 and remaining <= self.precision:
+                self.error += remaining
+                codes, probabilities = codes[:0], probabilities[:0]
+
+        self.states = table.decode(codes, probabilities)
+
+        return final
+
+    def compile(self, goal: T) -> TransitionMatrix[T]:
+        return TransitionMatrix(self, [state for state, probability in self.states.items() if probability > 0], goal)
+
+    def simulate_to_goal_array(self, goal: T) -> np.ndarray:
+        """Same distribution as simulate_to_goal, indexed by pull count, advanced with one sparse mat-vec per pull"""
+        matrix = self.compile(goal)
+
+        final, error = matrix.absorption(matrix.vector(self.states), self.precision)
+
+        self.states = defaultdict(float)
+        self.error += error
+
+        return final
+
+    def simulate_to_goal_joint(self, goal: T) -> dict[T, np.ndarray]:
+        matrix = self.compile(goal)
+
+        joint, error = matrix.absorption_joint(matrix.vector(self.states), self.precision)
+
+        self.states = defaultdict(float)
+        self.error += error
+
+        return joint
     
     def simulate_steps(self, steps: int) -> Mapping[T, float]:
+        if self.packed:
+            table = self.table
+            codes, probabilities = table.encode(self.states)
+
+            for i in range(steps):
+                if len(codes) == 0:
+                    break
+
+                codes, probabilities = table.step(codes, probabilities)
+
+            self.states = table.decode(codes, probabilities)
+
+            return self.states
+
         for i in range(steps):
             if len(self.states) == 0:
                 break
@@ -75,43 +408,92 @@ class Simulation(ABC, Generic[T]):
         ...
 
 
+class BannerSimulation(Simulation[T]):
+    """Pulls on a compiled banner, states expose their counters and rebuild themselves from new ones"""
+    banner: Banner
+
+    def __init__(self, initial: T, precision: float = 0.0, packed: bool = False, banner: Banner | None = None) -> None:
+        super().__init__(initial, precision, packed)
+
+        if banner is not None:
+            self.banner = banner
+
+    @property
+    def rule(self) -> Hashable:
+        return type(self), self.banner
+
+    def transition(self, state: T) -> dict[T, float]:
+        pity, copies, guaranteed, fate_points = state.counters
+
+        five_star_p = self.banner.rate(pity)
+
+        outputs = {state.advance(pity + 1, copies, guaranteed, fate_points): 1.0 - five_star_p}
+
+        for outcome in self.banner.outcomes[self.banner.key(guaranteed, fate_points)]:
+            outputs[state.advance(0, copies + outcome.target, outcome.guaranteed, outcome.fate_points)] = five_star_p * outcome.probability
+
+        return outputs
+
+
+@dataclass(frozen=True, unsafe_hash=True)
+class BannerState(SimulationState):
+    """State for any banner spec, copies of the target and fate points are tracked whether or not the banner uses them"""
+    pity: int
+    copies: int
+    guaranteed: bool
+    fate_points: int
+
+    BITS = (("pity", 7), ("copies", 6), ("guaranteed", 1), ("fate_points", 2))
+
+    def meets_goal(self, goal: "BannerState") -> bool:
+        return self.copies >= goal.copies
+
+    @property
+    def carried(self) -> 'BannerState':
+        return BannerState(self.pity, 0, self.guaranteed, 0)
+
+    @property
+    def counters(self) -> tuple[int, int, bool, int]:
+        return self.pity, self.copies, self.guaranteed, self.fate_points
+
+    def advance(self, pity: int, copies: int, guaranteed: bool, fate_points: int) -> 'BannerState':
+        return BannerState(pity, copies, guaranteed, fate_points)
+
+
+CHARACTER_BANNER = BANNERS["character"]
+WEAPON_BANNER = BANNERS["weapon"]
+
+
 @dataclass(frozen=True, unsafe_hash=True)
 class CharacterState(SimulationState):
     pity: int
     limited: int
     guaranteed: bool
 
+    BITS = (("pity", 7), ("limited", 6), ("guaranteed", 1))
+
     def meets_goal(self, goal: "CharacterState") -> bool:
         return self.limited >= goal.limited
 
     @property
-    def no_drop(self) -> 'CharacterState':
-        return CharacterState(self.pity + 1, self.limited, self.guaranteed)
-    
-    @property
-    def limited_drop(self) -> 'CharacterState':
-        return CharacterState(0, self.limited + 1, False)
-    
-    @property
-    def nonlimited_drop(self) -> 'CharacterState':
-        assert not self.guaranteed
+    def normalized(self) -> 'CharacterState':
+        # From the certain pity on the next pull is always a five star
+        return CharacterState(min(self.pity, CHARACTER_BANNER.certain), self.limited, self.guaranteed)
 
-        return CharacterState(0, self.limited, True)
+    @property
+    def carried(self) -> 'CharacterState':
+        return CharacterState(self.pity, 0, self.guaranteed)
 
+    @property
+    def counters(self) -> tuple[int, int, bool, int]:
+        return self.pity, self.limited, self.guaranteed, 0
 
-class CharacterSimulation(Simulation[CharacterState]):
-    def transition(self, state: CharacterState) -> dict[CharacterState, float]:
-        five_star_p = min(0.006 + 0.06 * max(0, state.pity - 72), 1.0)
+    def advance(self, pity: int, copies: int, guaranteed: bool, fate_points: int) -> 'CharacterState':
+        return CharacterState(pity, copies, guaranteed)
 
-        outputs = {state.no_drop: 1.0 - five_star_p}
 
-        if state.guaranteed:
-            outputs[state.limited_drop] = five_star_p
-        else:
-            outputs[state.limited_drop] = five_star_p * 0.5
-            outputs[state.nonlimited_drop] = five_star_p * 0.5
-        
-        return outputs
+class CharacterSimulation(BannerSimulation[CharacterState]):
+    banner = CHARACTER_BANNER
 
 
 @dataclass(frozen=True, unsafe_hash=True)
@@ -121,44 +503,33 @@ class WeaponState(SimulationState):
     limited_guaranteed: bool
     fate_points: int
 
+    BITS = (("pity", 7), ("target", 6), ("limited_guaranteed", 1), ("fate_points", 2))
+
     def meets_goal(self, goal: "WeaponState") -> bool:
         return self.target >= goal.target
-    
-    @property
-    def no_drop(self) -> 'WeaponState':
-        return WeaponState(self.pity + 1, self.target, self.limited_guaranteed, self.fate_points)
-    
-    @property
-    def target_drop(self) -> 'WeaponState':
-        return WeaponState(0, self.target + 1, False, 0)
-    
+
     @property
-    def limited_drop(self) -> 'WeaponState':
-        return WeaponState(0, self.target, False, self.fate_points + 1)
-    
+    def normalized(self) -> 'WeaponState':
+        # From the certain pity on the next pull is always a five star, and with full fate points the 75/25 no longer matters
+        fate_points = WEAPON_BANNER.spec.fate_points
+
+        return WeaponState(min(self.pity, WEAPON_BANNER.certain), self.target, self.limited_guaranteed and self.fate_points < fate_points, self.fate_points)
+
     @property
-    def nonlimited_drop(self) -> 'WeaponState':
-        return WeaponState(0, self.target, True, self.fate_points + 1)
+    def carried(self) -> 'WeaponState':
+        # Pity and the 75/25 guarantee carry over but fate points reset with every banner
+        return WeaponState(self.pity, 0, self.limited_guaranteed, 0)
 
+    @property
+    def counters(self) -> tuple[int, int, bool, int]:
+        return self.pity, self.target, self.limited_guaranteed, self.fate_points
 
-class WeaponSimulation(Simulation[WeaponState]):
-    def transition(self, state: WeaponState) -> dict[WeaponState, float]:
-        five_star_p = min(0.007 + 0.07 * max(0, state.pity - 62), 1.0)
+    def advance(self, pity: int, copies: int, guaranteed: bool, fate_points: int) -> 'WeaponState':
+        return WeaponState(pity, copies, guaranteed, fate_points)
 
-        outputs = {state.no_drop: 1.0 - five_star_p}
 
-        if state.fate_points >= 2:
-            outputs[state.target_drop] = five_star_p
-        else:
-            if state.limited_guaranteed:
-                outputs[state.target_drop] = five_star_p * 0.5
-                outputs[state.limited_drop] = five_star_p * 0.5
-            else:
-                outputs[state.nonlimited_drop] = five_star_p * 0.25
-                outputs[state.target_drop] = five_star_p * 0.75 * 0.5
-                outputs[state.limited_drop] = five_star_p * 0.75 * 0.5
-        
-        return outputs
+class WeaponSimulation(BannerSimulation[WeaponState]):
+    banner = WEAPON_BANNER
 
 
 def to_cumulative(probabilities: Mapping[int, float]) -> Mapping[int, float]:
@@ -170,173 +541,1054 @@ def to_cumulative(probabilities: Mapping[int, float]) -> Mapping[int, float]:
     return cumulative
 
 
+def cumulative(probabilities: np.ndarray) -> np.ndarray:
+    return np.minimum(np.cumsum(probabilities), 1.0)
+
+
+def probability_by(cumulative: np.ndarray, pulls: int) -> float:
+    return float(cumulative[pulls]) if pulls < len(cumulative) else 1.0
+
+
 class Quantiles:
-    def __init__(self, cumulative: Mapping[int, float]) -> None:
-        self.probabilities = [cumulative[i] for i in range(max(cumulative))]
+    """Inverse and forward queries against a dense CDF array, answered for whole batches at once"""
+    def __init__(self, cumulative: Mapping[int, float] | np.ndarray, maximum: int | None = None) -> None:
+        if not isinstance(cumulative, np.ndarray):
+            cumulative = np.array([cumulative.get(i, 0.0) for i in range(max(cumulative) + 1)], dtype=np.float64)
+
+        self.cumulative = cumulative
+
+        # A truncated CDF never reaches one, the exact worst case stands in for the 100th percentile
+        self.maximum = maximum
     
     def get_quantile(self, quantile: float) -> float:
         assert 0 < quantile <= 1
 
-        index = bisect.bisect(self.probabilities, quantile)
+        return float(self.get_quantiles(np.array([quantile]))[0])
 
-        value = self.probabilities[index] if index + 1 < len(self.probabilities) else 1
-        next_value = self.probabilities[index + 1] if index < len(self.probabilities) else 1
+    def get_quantiles(self, quantiles: np.ndarray) -> np.ndarray:
+        quantiles = np.asarray(quantiles, dtype=np.float64)
 
-        if next_value == value:
-            return index
+        upper = np.minimum(np.searchsorted(self.cumulative, quantiles, side="left"), len(self.cumulative) - 1)
+        lower = np.maximum(upper - 1, 0)
 
-        return (quantile - self.probabilities[index]) / (next_value - self.probabilities[index]) + index
+        low = self.cumulative[lower]
+        span = self.cumulative[upper] - low
 
+        fraction = np.divide(quantiles - low, span, out=np.zeros_like(quantiles), where=span > 0)
 
-@lru_cache()
-def pulls_character(initial: CharacterState, constellations: int) -> Mapping[int, float]:
-    sim = CharacterSimulation(initial)
-    return sim.simulate_to_goal(CharacterState(0, constellations + 1, False))
+        values = lower + np.clip(fraction, 0.0, 1.0)
 
+        if self.maximum is not None:
+            values = np.where(quantiles >= 1.0, self.maximum, values)
 
-@lru_cache()
-def pulls_weapon(initial: WeaponState, refinements: int) -> Mapping[int, float]:
-    sim = WeaponSimulation(initial)
-    return sim.simulate_to_goal(WeaponState(0, refinements, False, 0))
+        return values
 
+    def get_pulls_needed(self, chances: np.ndarray) -> np.ndarray:
+        """Smallest pull counts whose chance of success reaches each of the given chances"""
+        chances = np.asarray(chances, dtype=np.float64)
 
-class GenshinCog(ACog):
-    @comms.hybrid_group()
-    async def pulls(self, ctx: ArcContext) -> None:
-        ...
-    
-    @pulls.command()
-    async def character(self, ctx: ArcContext, constellations: int, pull_count: int, starting_pity: int = 0, guaranteed: bool = False) -> None:
-        if constellations > 6 or constellations < 0:
-            await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
-            return
-        
-        if pull_count <= 0:
-            await ctx.replyEmbed("Invalid Pull Count", "Input a valid pull count", error=True)
-            return
+        needed = np.minimum(np.searchsorted(self.cumulative, chances, side="left"), len(self.cumulative) - 1)
 
-        if starting_pity < 0:
-            await ctx.replyEmbed("Invalid Starting Pity", "Input a valid starting pity", error=True)
-            return
+        if self.maximum is not None:
+            needed = np.where(chances >= 1.0, self.maximum, needed)
 
-        async with ctx.typing():
-            results = pulls_character(CharacterState(starting_pity, 0, guaranteed), constellations)
+        return needed
 
-            cumulative =  to_cumulative(results)
-            
-            await ctx.replyEmbed(f"Chances of C{constellations} by {pull_count} pulls", f"The chance of getting C{constellations} by {pull_count} pulls is exactly **{cumulative.get(pull_count, 1)*100:.2f}%**")
-    
-    @pulls.command()
-    async def weapon(self, ctx: ArcContext, refinements: int, pull_count: int, starting_pity: int = 0, guaranteed: bool = False, fate_points: int = 0) -> None:
-        if refinements > 5 or refinements < 1:
-            await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
-            return
-        
-        if pull_count <= 0:
-            await ctx.replyEmbed("Invalid Pull Count", "Input a valid pull count", error=True)
-            return
-        
-        if fate_points > 2 or fate_points < 0:
-            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
-            return
+    def get_probabilities(self, pulls: np.ndarray) -> np.ndarray:
+        pulls = np.asarray(pulls, dtype=np.intp)
 
-        if starting_pity < 0:
-            await ctx.replyEmbed("Invalid Starting Pity", "Input a valid starting pity", error=True)
-            return
+        certain = pulls >= len(self.cumulative) if self.maximum is None else (pulls >= len(self.cumulative)) | (pulls >= self.maximum)
 
-        async with ctx.typing():
-            results = pulls_weapon(WeaponState(starting_pity, 0, guaranteed, fate_points), refinements)
+        return np.where(certain, 1.0, self.cumulative[np.clip(pulls, 0, len(self.cumulative) - 1)])
 
-            cumulative =  to_cumulative(results)
-            
-            await ctx.replyEmbed(f"Chances of R{refinements} by {pull_count} pulls", f"The chance of getting R{refinements} by {pull_count} pulls is exactly **{cumulative.get(pull_count, 1)*100:.2f}%**")
-    
-    @pulls.command()
-    async def combined(self, ctx: ArcContext, constellations: int, refinements: int, pull_count: int, starting_pity_character: int = 0, guaranteed_character: bool = False, starting_pity_weapon: int = 0, guaranteed_weapon: bool = False, fate_points: int = 0):
-        if constellations > 6 or constellations < 0:
-            await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
-            return
-        
-        if refinements > 5 or refinements < 1:
-            await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
-            return
-        
-        if pull_count <= 0:
-            await ctx.replyEmbed("Invalid Pull Count", "Input a valid pull count", error=True)
-            return
-        
-        if fate_points > 2 or fate_points < 0:
-            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
-            return
 
-        if starting_pity_character < 0:
-            await ctx.replyEmbed("Invalid Starting Pity - Character", "Input a valid starting pity - character", error=True)
-            return
+FFT_THRESHOLD = 64
 
-        if starting_pity_weapon < 0:
-            await ctx.replyEmbed("Invalid Starting Pity - Weapon", "Input a valid starting pity - weapon", error=True)
-            return
 
-        async with ctx.typing():
-            weapon = pulls_weapon(WeaponState(starting_pity_weapon, 0, guaranteed_weapon, fate_points), refinements)
-            character = pulls_character(CharacterState(starting_pity_character, 0, guaranteed_character), constellations)
+def convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if min(len(a), len(b)) <= FFT_THRESHOLD:
+        return np.convolve(a, b)
 
-            final = defaultdict(float)
+    length = len(a) + len(b) - 1
+    size = 1 << (length - 1).bit_length()
 
-            for w in weapon:
-                for c in character:
-                    final[w + c] += weapon[w] * character[c]
-            
-            cumulative = to_cumulative(final)
+    result = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)[:length]
 
-            await ctx.replyEmbed(f"Chances of C{constellations}R{refinements} by {pull_count} pulls", f"The chance of getting C{constellations}R{refinements} by {pull_count} pulls is exactly **{cumulative.get(pull_count, 1)*100:.2f}%**")
-    
-    @pulls.command()
-    async def percentiles(self, ctx: ArcContext, constellations: int | None = None, refinements: int | None = None):
-        if constellations is None and refinements is None:
-            await ctx.replyEmbed("Invalid Parameters", "Input either a constellation count or a refinement count or both", error=True)
-            return
+    # Round off from the transforms can leave tiny negative probabilities in the tails
+    return np.clip(result, 0.0, None)
 
-        if constellations is not None:
-            if constellations > 6 or constellations < 0:
-                await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
-                return
-        
-        if refinements is not None:
-            if refinements > 5 or refinements < 1:
-                await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
-                return
 
-        async with ctx.typing():
-            if refinements is not None:
-                weapon = pulls_weapon(WeaponState(0, 0, False, 0), refinements)
-            else:
-                weapon = {0: 1}
+def truncate(distribution: np.ndarray, precision: float) -> np.ndarray:
+    """Drops the longest tail holding no more than precision of the mass"""
+    if precision <= 0:
+        return distribution
 
-            if constellations is not None:
-                character = pulls_character(CharacterState(0, 0, False), constellations)
-            else:
-                character = {0: 1}
+    tail = np.cumsum(distribution[::-1])
 
-            final = defaultdict(float)
+    return distribution[:len(distribution) - np.searchsorted(tail, precision, side="right")]
 
-            for w in weapon:
-                for c in character:
-                    final[w + c] += weapon[w] * character[c]
-            
-            cumulative = to_cumulative(final)
 
-            quantiles = Quantiles(cumulative)
+def error_bound(distribution: np.ndarray) -> float:
+    """Largest possible error of any cumulative probability read from a truncated distribution"""
+    return max(0.0, 1.0 - float(distribution.sum()))
 
-            percentiles = (0.1, 1, 5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 99, 99.9, 100)
-            percentile_values = map(lambda p: quantiles.get_quantile(p / 100), percentiles)
 
-            percentile_summary = "\n".join([f"{percentile}".rjust(4, " ") + f": {value:.2f}" for percentile, value in zip(percentiles, percentile_values)])
+def chance_label(distribution: np.ndarray, pulls: int) -> str:
+    """The chance of success by some pull count, shown as a range only when the truncated mass could change the digits shown"""
+    chance = probability_by(cumulative(distribution), pulls)
+    error = error_bound(distribution)
 
-            cr_string = (f"C{constellations}" if constellations is not None else "") + (f"R{refinements}" if refinements is not None else "")
+    # The truncated tail lies past the end of the array, so it can only add to chances read before the end
+    low, high = (chance, min(chance + error, 1.0)) if pulls < len(distribution) else (1.0 - error, 1.0)
+
+    if f"{low*100:.2f}" == f"{high*100:.2f}":
+        return f"**{low*100:.2f}%**"
+
+    return f"between **{low*100:.2f}%** and **{high*100:.2f}%**"
+
+
+def convolution_power(distribution: np.ndarray, n: int, precision: float = 0.0) -> np.ndarray:
+    result = np.ones(1, dtype=np.float64)
+    base = distribution
+
+    while n > 0:
+        if n & 1:
+            result = truncate(convolve(result, base), precision)
+
+        n >>= 1
+
+        if n > 0:
+            base = truncate(convolve(base, base), precision)
+
+    return result
+
+
+def combine(*distributions: np.ndarray) -> np.ndarray:
+    """Distribution of the total pulls of independent banners, all spectra are multiplied in a single transform"""
+    if len(distributions) == 0:
+        return np.ones(1, dtype=np.float64)
+
+    if len(distributions) <= 2:
+        return reduce(convolve, distributions)
+
+    length = sum(len(distribution) for distribution in distributions) - len(distributions) + 1
+    size = 1 << (length - 1).bit_length()
+
+    spectrum = np.ones(size // 2 + 1, dtype=np.complex128)
+
+    for distribution in distributions:
+        spectrum *= np.fft.rfft(distribution, size)
+
+    return np.clip(np.fft.irfft(spectrum, size)[:length], 0.0, None)
+
+
+class RenewalSolver(Generic[T]):
+    """Builds n copy distributions from single copy segments, every copy after the first restarts from the renewal state"""
+    def __init__(self, simulation: type[Simulation[T]], renewal: T, single: T, precision: float = 0.0) -> None:
+        self.simulation = simulation
+        self.renewal = renewal
+        self.single = single
+        self.precision = precision
+
+        self.segments: dict[T, np.ndarray] = {}
+        self.powers: dict[int, np.ndarray] = {0: np.ones(1, dtype=np.float64)}
+
+    def clear(self) -> None:
+        self.segments.clear()
+        self.powers = {0: np.ones(1, dtype=np.float64)}
+
+    def segment(self, initial: T) -> np.ndarray:
+        if initial not in self.segments:
+            self.segments[initial] = self.simulation(initial).simulate_to_goal_array(self.single)
+
+        return self.segments[initial]
+
+    def power(self, copies: int) -> np.ndarray:
+        if copies not in self.powers:
+            self.powers[copies] = convolution_power(self.segment(self.renewal), copies, self.precision)
+
+        return self.powers[copies]
+
+    def distribution(self, initial: T, copies: int) -> np.ndarray:
+        if copies <= 0:
+            return np.ones(1, dtype=np.float64)
+
+        # The first copy starts from the given pity and guarantee, which shifts only the first segment
+        return truncate(convolve(self.segment(initial), self.power(copies - 1)), self.precision)
+
+    def distributions(self, initial: T, copies: int) -> list[np.ndarray]:
+        """Distributions for one up to the given number of copies, each extending the last by a renewal segment"""
+        results = [self.segment(initial)]
+
+        while len(results) < copies:
+            results.append(truncate(convolve(results[-1], self.segment(self.renewal)), self.precision))
+
+        return results[:copies]
+
+    def maximum(self, initial: T, copies: int) -> int:
+        """Worst case pull count, single copy segments are never truncated so this stays exact"""
+        if copies <= 0:
+            return 0
+
+        return len(self.segment(initial)) - 1 + (copies - 1) * (len(self.segment(self.renewal)) - 1)
+
+
+# Embeds show chances to two decimals of a percent, so a 1e-4 step, and the truncation error stays far below half of it
+PRECISION = 1e-7
+
+CHARACTER_SOLVER = RenewalSolver(CharacterSimulation, CharacterState(0, 0, False), CharacterState(0, 1, False), PRECISION)
+WEAPON_SOLVER = RenewalSolver(WeaponSimulation, WeaponState(0, 0, False, 0), WeaponState(0, 1, False, 0), PRECISION)
+
+
+COMPUTE_TIMEOUT = 30.0
+
+
+class ResultCache:
+    """Parent side LRU cache for distributions computed in the bot's process pool"""
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.results: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def get(self, key: Hashable) -> np.ndarray | None:
+        result = self.results.get(key)
+
+        if result is not None:
+            self.results.move_to_end(key)
+
+        return result
+
+    def put(self, key: Hashable, result: np.ndarray) -> None:
+        self.results[key] = result
+        self.results.move_to_end(key)
+
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+
+RESULTS = ResultCache(1024)
+
+
+@lru_cache()
+def pulls_character(initial: CharacterState, constellations: int) -> np.ndarray:
+    return CHARACTER_SOLVER.distribution(initial, constellations + 1)
+
+
+@lru_cache()
+def pulls_weapon(initial: WeaponState, refinements: int) -> np.ndarray:
+    return WEAPON_SOLVER.distribution(initial, refinements)
+
+
+@lru_cache()
+def pulls_character_levels(initial: CharacterState, constellations: int) -> dict[int, np.ndarray]:
+    return dict(enumerate(CHARACTER_SOLVER.distributions(initial, constellations + 1)))
+
+
+@lru_cache()
+def pulls_weapon_levels(initial: WeaponState, refinements: int) -> dict[int, np.ndarray]:
+    return dict(enumerate(WEAPON_SOLVER.distributions(initial, refinements), start=1))
+
+
+LEVELS: dict[str, Callable[..., dict[int, np.ndarray]]] = {
+    pulls_character.__name__: pulls_character_levels,
+    pulls_weapon.__name__: pulls_weapon_levels
+}
+
+
+def add(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if len(a) < len(b):
+        a, b = b, a
+
+    result = a.copy()
+    result[:len(b)] += b
+
+    return result
+
+
+@lru_cache()
+def segment_joint(simulation: type[Simulation[T]], initial: T, goal: T, precision: float = 0.0) -> dict[T, np.ndarray]:
+    return simulation(initial, precision).simulate_to_goal_joint(goal)
+
+
+def chain_segment(simulation: type[Simulation[T]], starts: Mapping[T, np.ndarray], goal: T, precision: float = 0.0) -> dict[T, np.ndarray]:
+    """Runs one more banner from every carried state, keyed by the state carried out of it with the pulls spent so far"""
+    ends: dict[T, np.ndarray] = {}
+
+    for start, spent in starts.items():
+        for end, pulls in segment_joint(simulation, start, goal, precision).items():
+            total = convolve(spent, pulls)
+
+            ends[end.carried] = add(ends[end.carried], total) if end.carried in ends else total
+
+    return ends
+
+
+def marginal(joint: Mapping[T, np.ndarray]) -> np.ndarray:
+    return reduce(add, joint.values())
+
+
+def sweep(simulation: type[Simulation[T]], initials: list[T], goal: T, pulls: Sequence[int]) -> np.ndarray:
+    """Chance of success for every initial state, one row each, by every pull count, one column each"""
+    matrix = TransitionMatrix(simulation(initials[0]), initials, goal)
+
+    values = matrix.success(pulls)
+
+    return values[:, [matrix.indices[initial] for initial in initials]].T
+
+
+def pulls_sweep(banner: str, level: int, guaranteed: bool, fate_points: int, pities: tuple[int, ...], pulls: tuple[int, ...]) -> np.ndarray:
+    if banner == "character":
+        return sweep(CharacterSimulation, [CharacterState(pity, 0, guaranteed) for pity in pities], CharacterState(0, level + 1, False), pulls)
+
+    return sweep(WeaponSimulation, [WeaponState(pity, 0, guaranteed, fate_points) for pity in pities], WeaponState(0, level, False, 0), pulls)
+
+
+# Far past any worst case, every distribution has reached certainty long before this
+MAX_PULL_COUNT = 100_000
+
+
+def pulls_label(pulls: int, units: str) -> str:
+    if units == "Pulls":
+        return f"{pulls} pulls"
+
+    return f"{pulls} pulls for {format_units(units, float(convert(units, pulls)))}"
+
+
+SHADES = " ░▒▓█"
+
+
+def heatmap(chances: np.ndarray, rows: Sequence[int], columns: Sequence[int]) -> str:
+    header = "pity" + "".join(f"{column}".rjust(6, " ") for column in columns)
+
+    lines = [header]
+
+    for row, values in zip(rows, chances):
+        cells = "".join(f" {SHADES[min(int(value * len(SHADES)), len(SHADES) - 1)]}{value*100:4.0f}" for value in values)
+
+        lines.append(f"{row}".rjust(4, " ") + cells)
+
+    return "\n".join(lines)
+
+
+def allocate_budget(character: np.ndarray, weapon: np.ndarray, budget: int) -> tuple[np.ndarray, np.ndarray]:
+    """Best chance and character pull count for every pair of targets, given CDF rows sampled at 0 to budget pulls"""
+    # chances[c, r, k] is the chance of both targets with k pulls on the character banner and the rest on the weapon banner
+    chances = character[:, None, :budget + 1] * weapon[None, :, budget::-1]
+
+    splits = chances.argmax(axis=2)
+
+    return np.take_along_axis(chances, splits[..., None], axis=2)[..., 0], splits
+
+
+def frontier(best: np.ndarray, confidence: float) -> list[tuple[int, int]]:
+    """Targets reaching the confidence that no other reaching target beats in both constellations and refinements"""
+    reached = [(c, r) for c in range(best.shape[0]) for r in range(best.shape[1]) if best[c, r] >= confidence]
+
+    return [(c, r) for c, r in reached if not any(other != (c, r) and other[0] >= c and other[1] >= r for other in reached)]
+
+
+PLAN_SEGMENT = re.compile(r"^([CR])([0-9])$")
+
+
+def parse_plan(plan: str) -> tuple[str, ...] | None:
+    segments = tuple(plan.upper().replace(",", " ").split())
+
+    for segment in segments:
+        match = PLAN_SEGMENT.match(segment)
+
+        if match is None:
+            return None
+
+        banner, level = match.group(1), int(match.group(2))
+
+        if banner == "C" and level > 6 or banner == "R" and not 1 <= level <= 5:
+            return None
+
+    return segments if len(segments) > 0 else None
+
+
+def pulls_plan(character: CharacterState, weapon: WeaponState, segments: tuple[str, ...]) -> np.ndarray:
+    """Total pull distributions after each segment of a plan, one row per segment, every segment being its own banner"""
+    characters: dict[CharacterState, np.ndarray] = {character: np.ones(1, dtype=np.float64)}
+    weapons: dict[WeaponState, np.ndarray] = {weapon: np.ones(1, dtype=np.float64)}
+
+    prefixes = []
+
+    for segment in segments:
+        level = int(segment[1:])
+
+        if segment[0] == "C":
+            characters = chain_segment(CharacterSimulation, characters, CharacterState(0, level + 1, False), PRECISION)
+        else:
+            weapons = chain_segment(WeaponSimulation, weapons, WeaponState(0, level, False, 0), PRECISION)
+
+        # Both banners keep their own pity, so their totals are independent and only meet in the sum
+        prefixes.append(combine(marginal(characters), marginal(weapons)))
+
+    table = np.zeros((len(prefixes), max(len(prefix) for prefix in prefixes)), dtype=np.float64)
+
+    for i, prefix in enumerate(prefixes):
+        table[i, :len(prefix)] = prefix
+
+    return table
+
+
+TABLE_FORMAT = 1
+
+
+class DistributionTable(Generic[T]):
+    """Precomputed distributions for every common starting state, stored as one flat array file and memory mapped"""
+    def __init__(self, name: str, solver: RenewalSolver[T], initials: list[T], levels: range, offset: int) -> None:
+        self.name = name
+        self.solver = solver
+        self.initials = initials
+        self.levels = levels
+        self.offset = offset
+
+        self.indices = {initial: i for i, initial in enumerate(initials)}
+
+        self.table: np.ndarray | None = None
+
+    @cached_property
+    def digest(self) -> str:
+        # The single copy transitions from every tabled state are the banner parameters, any change to them renames the file
+        matrix = TransitionMatrix(self.solver.simulation(self.solver.renewal), self.initials, self.solver.single)
+
+        digest = hashlib.sha256(f"{TABLE_FORMAT}:{self.levels}:{self.offset}:{self.solver.precision}".encode())
+
+        digest.update(repr(matrix.states).encode())
+
+        for array in (matrix.sources, matrix.destinations, matrix.probabilities):
+            digest.update(array.tobytes())
+
+        return digest.hexdigest()[:16]
+
+    def path(self, directory: Path) -> Path:
+        return directory / f"{self.name}-{self.digest}.npy"
+
+    def build(self, directory: Path) -> Path:
+        rows = [[self.solver.distribution(initial, level + self.offset) for level in self.levels] for initial in self.initials]
+
+        length = max(len(distribution) for row in rows for distribution in row)
+
+        table = np.zeros((len(self.initials), len(self.levels), length), dtype=np.float64)
+
+        for i, row in enumerate(rows):
+            for j, distribution in enumerate(row):
+                table[i, j, :len(distribution)] = distribution
+
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.path(directory)
+        temporary = path.with_suffix(".tmp")
+
+        with temporary.open("wb") as file:
+            np.save(file, table)
+
+        os.replace(temporary, path)
+
+        for stale in directory.glob(f"{self.name}-*.npy"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+
+        return path
+
+    def load(self, directory: Path) -> bool:
+        path = self.path(directory)
+
+        if not path.exists():
+            return False
+
+        self.table = np.load(path, mmap_mode="r")
+
+        return True
+
+    def get(self, initial: T, level: int) -> np.ndarray | None:
+        if self.table is None or initial not in self.indices or level not in self.levels:
+            return None
+
+        return np.trim_zeros(self.table[self.indices[initial], level - self.levels.start], "b")
+
+
+CHARACTER_TABLE = DistributionTable(
+    "character",
+    CHARACTER_SOLVER,
+    [CharacterState(pity, 0, guaranteed) for guaranteed in (False, True) for pity in range(CHARACTER_BANNER.certain + 1)],
+    range(0, 7),
+    1
+)
+WEAPON_TABLE = DistributionTable(
+    "weapon",
+    WEAPON_SOLVER,
+    [WeaponState(pity, 0, guaranteed, fate_points) for fate_points in range(WEAPON_BANNER.spec.fate_points + 1) for guaranteed in (False, True) for pity in range(WEAPON_BANNER.certain + 1)],
+    range(1, 6),
+    0
+)
+
+TABLES: dict[str, DistributionTable] = {
+    pulls_character.__name__: CHARACTER_TABLE,
+    pulls_weapon.__name__: WEAPON_TABLE
+}
+
+
+def build_table(name: str, directory: str) -> str:
+    return str(TABLES[name].build(Path(directory)))
+
+
+def lookup(key: tuple) -> np.ndarray | None:
+    name, *args = key
+
+    result = RESULTS.get(key)
+
+    if result is None and name in TABLES:
+        result = TABLES[name].get(*args)
+
+    return result
+
+
+FLIGHT: SingleFlight[tuple, np.ndarray] = SingleFlight("genshin", lookup)
+
+
+WISHES_DIRECTORY = "wishes"
+
+# Largest wish history export accepted, a few years of wishes is well under a megabyte
+HISTORY_LIMIT = 32 * 2 ** 20
+
+FRESH = PoolState(0, False, 0)
+
+
+def choose(given: T | None, imported: T) -> T:
+    return imported if given is None else given
+
+
+class GenshinCog(ACog):
+    async def __ainit__(self) -> None:
+        directory = Path(self.bot.settings.cache_directory)
+
+        self.warmups: list[asyncio.Task] = []
+
+        for name, table in TABLES.items():
+            if table.load(directory):
+                self.logger.debug(f"Mapped {table.path(directory)}")
+            else:
+                self.warmups.append(asyncio.create_task(self.warmup(name, table, directory)))
+
+        self.wishes = WishStore(directory / WISHES_DIRECTORY)
+        self.imported: dict[int, dict[str, PoolState] | None] = {}
+
+        # Imports by one user merge into the same history file, so they run one at a time
+        self.importing: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def cog_unload(self) -> None:
+        for task in self.warmups:
+            task.cancel()
+
+    async def warmup(self, name: str, table: DistributionTable, directory: Path) -> None:
+        self.logger.info(f"Building {table.name} distribution table in {directory}")
+
+        try:
+            await self.bot.compute(build_table, name, str(directory))
+        except Exception:
+            self.logger.exception(f"Failed to build {table.name} distribution table")
+            return
+
+        table.load(directory)
+
+        self.logger.info(f"Mapped {table.path(directory)}")
+
+    async def compute(self, function: Callable[..., np.ndarray], *args: Hashable) -> np.ndarray:
+        args = tuple(arg.normalized if isinstance(arg, SimulationState) else arg for arg in args)
+
+        return await FLIGHT.run((function.__name__, *args), lambda: self.evaluate(function, *args))
+
+    async def evaluate(self, function: Callable[..., np.ndarray], *args: Hashable) -> np.ndarray:
+        if function.__name__ not in LEVELS:
+            result = await self.bot.compute(function, *args, timeout=COMPUTE_TIMEOUT)
+
+            RESULTS.put((function.__name__, *args), result)
+
+            return result
+
+        *initial, level = args
+
+        # Every lower level falls out of the same computation, so the burst of follow up queries is already cached
+        levels = await self.bot.compute(LEVELS[function.__name__], *args, timeout=COMPUTE_TIMEOUT)
+
+        for lower, distribution in levels.items():
+            RESULTS.put((function.__name__, *initial, lower), distribution)
+
+        return levels[level]
+
+    def worst_case(self, constellations: int | None, refinements: int | None, character: CharacterState, weapon: WeaponState) -> int:
+        maximum = 0
+
+        if constellations is not None:
+            maximum += CHARACTER_SOLVER.maximum(character.normalized, constellations + 1)
+
+        if refinements is not None:
+            maximum += WEAPON_SOLVER.maximum(weapon.normalized, refinements)
+
+        return maximum
+
+    async def gather(self, constellations: int | None, refinements: int | None, character: CharacterState, weapon: WeaponState) -> list[np.ndarray]:
+        queries = []
+
+        if refinements is not None:
+            queries.append(self.compute(pulls_weapon, weapon, refinements))
+
+        if constellations is not None:
+            queries.append(self.compute(pulls_character, character, constellations))
+
+        return list(await asyncio.gather(*queries))
+
+    async def pool_states(self, user: int) -> dict[str, PoolState] | None:
+        if user not in self.imported:
+            self.imported[user] = await asyncio.to_thread(self.wishes.states, user)
+
+        return self.imported[user]
+
+    async def starting(self, user: discord.abc.User, pity_character: int | None = None, guaranteed_character: bool | None = None, pity_weapon: int | None = None, guaranteed_weapon: bool | None = None, fate_points: int | None = None) -> tuple[CharacterState, WeaponState]:
+        """Starting states with everything not given taken from the user's imported wish history, a fresh account without one"""
+        states = await self.pool_states(user.id)
+
+        character = states["character"] if states is not None else FRESH
+        weapon = states["weapon"] if states is not None else FRESH
+
+        return (
+            CharacterState(choose(pity_character, character.pity), 0, choose(guaranteed_character, character.guaranteed)),
+            WeaponState(choose(pity_weapon, weapon.pity), 0, choose(guaranteed_weapon, weapon.guaranteed), choose(fate_points, 0))
+        )
+
+    async def download(self, attachment: discord.Attachment, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(attachment.url) as response:
+                response.raise_for_status()
+
+                with path.open("wb") as file:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        file.write(chunk)
+
+    def history_embed(self, ctx: ArcContext, title: str, description: str, states: dict[str, PoolState]) -> discord.Embed:
+        embed = ctx.generateEmbed(title, description)
+
+        character, weapon = states["character"], states["weapon"]
+
+        embed.add_field(name="Character Pity", value=f"{character.pity}{' (guaranteed)' if character.guaranteed else ''}")
+        embed.add_field(name="Weapon Pity", value=f"{weapon.pity}{' (guaranteed)' if weapon.guaranteed else ''}")
+
+        return embed
+
+    @comms.hybrid_group()
+    async def pulls(self, ctx: ArcContext) -> None:
+        ...
+
+    @pulls.command(name="import")
+    async def import_history(self, ctx: ArcContext, history: discord.Attachment) -> None:
+        if history.size > HISTORY_LIMIT:
+            await ctx.replyEmbed("History Too Large", f"Wish history exports must be under {HISTORY_LIMIT // 2 ** 20} MB", error=True)
+            return
+
+        self.wishes.directory.mkdir(parents=True, exist_ok=True)
+
+        # A file of its own per upload, two imports at once never write into each other's download
+        with tempfile.NamedTemporaryFile(dir=self.wishes.directory, prefix=f"{ctx.author.id}-", suffix=".upload", delete=False) as file:
+            path = Path(file.name)
+
+        async with ctx.typing():
+            try:
+                await self.download(history, path)
+
+                async with self.importing[ctx.author.id]:
+                    added, merged = await asyncio.to_thread(self.wishes.import_file, ctx.author.id, path)
+            except aiohttp.ClientError:
+                self.logger.exception("Failed to download a wish history")
+
+                await ctx.replyEmbed("Download Failed", "The uploaded file could not be downloaded, please try again", error=True)
+                return
+            except ValueError as e:
+                await ctx.replyEmbed("Invalid History", f"{e}, upload a UIGF JSON or CSV wish history export", error=True)
+                return
+            finally:
+                path.unlink(missing_ok=True)
+
+            states = pool_states(merged)
+
+            self.imported[ctx.author.id] = states
+
+            description = (
+                f"Imported {added} new wishes, {len(merged)} in total. Pulls commands now start from this state unless told otherwise. "
+                "Exports do not say which banner a wish was made on, so fate points still start at 0 unless given."
+            )
+
+            await ctx.reply(embed=self.history_embed(ctx, "Wish History Imported", description, states))
+
+    @pulls.command()
+    async def history(self, ctx: ArcContext) -> None:
+        states = await self.pool_states(ctx.author.id)
+
+        if states is None:
+            await ctx.replyEmbed("No Wish History", "Import a wish history export with the import command first", error=True)
+            return
+
+        await ctx.reply(embed=self.history_embed(ctx, "Wish History", f"Starting state from {states['character'].pulls + states['weapon'].pulls} imported event wishes.", states))
+    
+    @pulls.command()
+    async def character(self, ctx: ArcContext, constellations: int, pull_count: int, starting_pity: int | None = None, guaranteed: bool | None = None, units: str = "Pulls") -> None:
+        if constellations > 6 or constellations < 0:
+            await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
+            return
+        
+        if pull_count <= 0 or pull_count > MAX_PULL_COUNT:
+            await ctx.replyEmbed("Invalid Pull Count", f"Input a pull count between 1 and {MAX_PULL_COUNT}", error=True)
+            return
+
+        if starting_pity is not None and starting_pity < 0:
+            await ctx.replyEmbed("Invalid Starting Pity", "Input a valid starting pity", error=True)
+            return
+
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type", error=True)
+            return
+
+        character, _ = await self.starting(ctx.author, starting_pity, guaranteed)
+
+        async with ctx.typing():
+            try:
+                results = await self.compute(pulls_character, character, constellations)
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            await ctx.replyEmbed(f"Chances of C{constellations} by {pull_count} pulls", f"The chance of getting C{constellations} by {pulls_label(pull_count, units)} is {chance_label(results, pull_count)}")
+    
+    @pulls.command()
+    async def weapon(self, ctx: ArcContext, refinements: int, pull_count: int, starting_pity: int | None = None, guaranteed: bool | None = None, fate_points: int | None = None, units: str = "Pulls") -> None:
+        if refinements > 5 or refinements < 1:
+            await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
+            return
+        
+        if pull_count <= 0 or pull_count > MAX_PULL_COUNT:
+            await ctx.replyEmbed("Invalid Pull Count", f"Input a pull count between 1 and {MAX_PULL_COUNT}", error=True)
+            return
+        
+        if fate_points is not None and (fate_points > 2 or fate_points < 0):
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        if starting_pity is not None and starting_pity < 0:
+            await ctx.replyEmbed("Invalid Starting Pity", "Input a valid starting pity", error=True)
+            return
+
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type", error=True)
+            return
+
+        _, weapon = await self.starting(ctx.author, pity_weapon=starting_pity, guaranteed_weapon=guaranteed, fate_points=fate_points)
+
+        async with ctx.typing():
+            try:
+                results = await self.compute(pulls_weapon, weapon, refinements)
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            await ctx.replyEmbed(f"Chances of R{refinements} by {pull_count} pulls", f"The chance of getting R{refinements} by {pulls_label(pull_count, units)} is {chance_label(results, pull_count)}")
+    
+    @pulls.command()
+    async def combined(self, ctx: ArcContext, constellations: int, refinements: int, pull_count: int, starting_pity_character: int | None = None, guaranteed_character: bool | None = None, starting_pity_weapon: int | None = None, guaranteed_weapon: bool | None = None, fate_points: int | None = None, units: str = "Pulls"):
+        if constellations > 6 or constellations < 0:
+            await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
+            return
+        
+        if refinements > 5 or refinements < 1:
+            await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
+            return
+        
+        if pull_count <= 0 or pull_count > MAX_PULL_COUNT:
+            await ctx.replyEmbed("Invalid Pull Count", f"Input a pull count between 1 and {MAX_PULL_COUNT}", error=True)
+            return
+        
+        if fate_points is not None and (fate_points > 2 or fate_points < 0):
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        if starting_pity_character is not None and starting_pity_character < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Character", "Input a valid starting pity - character", error=True)
+            return
+
+        if starting_pity_weapon is not None and starting_pity_weapon < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Weapon", "Input a valid starting pity - weapon", error=True)
+            return
+
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type", error=True)
+            return
+
+        character, weapon = await self.starting(ctx.author, starting_pity_character, guaranteed_character, starting_pity_weapon, guaranteed_weapon, fate_points)
+
+        async with ctx.typing():
+            try:
+                weapon, character = await asyncio.gather(
+                    self.compute(pulls_weapon, weapon, refinements),
+                    self.compute(pulls_character, character, constellations)
+                )
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            await ctx.replyEmbed(f"Chances of C{constellations}R{refinements} by {pull_count} pulls", f"The chance of getting C{constellations}R{refinements} by {pulls_label(pull_count, units)} is {chance_label(combine(weapon, character), pull_count)}")
+    
+    @pulls.command()
+    async def percentiles(self, ctx: ArcContext, constellations: int | None = None, refinements: int | None = None, units: str = "Pulls"):
+        if constellations is None and refinements is None:
+            await ctx.replyEmbed("Invalid Parameters", "Input either a constellation count or a refinement count or both", error=True)
+            return
+
+        if constellations is not None:
+            if constellations > 6 or constellations < 0:
+                await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
+                return
+        
+        if refinements is not None:
+            if refinements > 5 or refinements < 1:
+                await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
+                return
+
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type", error=True)
+            return
+
+        async with ctx.typing():
+            try:
+                distributions = await self.gather(constellations, refinements, CharacterState(0, 0, False), WeaponState(0, 0, False, 0))
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            quantiles = Quantiles(cumulative(combine(*distributions)), self.worst_case(constellations, refinements, CharacterState(0, 0, False), WeaponState(0, 0, False, 0)))
+
+            percentiles = (0.1, 1, 5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 99, 99.9, 100)
+            percentile_values = convert(units, quantiles.get_quantiles(np.array(percentiles) / 100))
+
+            percentile_summary = "\n".join([f"{percentile}".rjust(4, " ") + f": {format_units(units, value)}" for percentile, value in zip(percentiles, percentile_values)])
+
+            cr_string = (f"C{constellations}" if constellations is not None else "") + (f"R{refinements}" if refinements is not None else "")
+
+            await ctx.replyEmbed(f"Percentiles for {cr_string}", f"```{percentile_summary}```")
+
+    @pulls.command()
+    async def needed(self, ctx: ArcContext, constellations: int | None = None, refinements: int | None = None, chances: str = "50 90 99", starting_pity_character: int | None = None, guaranteed_character: bool | None = None, starting_pity_weapon: int | None = None, guaranteed_weapon: bool | None = None, fate_points: int | None = None, units: str = "Pulls"):
+        if constellations is None and refinements is None:
+            await ctx.replyEmbed("Invalid Parameters", "Input either a constellation count or a refinement count or both", error=True)
+            return
+
+        if constellations is not None:
+            if constellations > 6 or constellations < 0:
+                await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
+                return
+        
+        if refinements is not None:
+            if refinements > 5 or refinements < 1:
+                await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
+                return
+
+        if fate_points is not None and (fate_points > 2 or fate_points < 0):
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        if starting_pity_character is not None and starting_pity_character < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Character", "Input a valid starting pity - character", error=True)
+            return
+
+        if starting_pity_weapon is not None and starting_pity_weapon < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Weapon", "Input a valid starting pity - weapon", error=True)
+            return
+
+        try:
+            targets = np.array([float(chance.rstrip("%")) for chance in chances.replace(",", " ").split()])
+        except ValueError:
+            targets = np.array([])
+
+        if len(targets) == 0 or np.any(targets <= 0) or np.any(targets > 100):
+            await ctx.replyEmbed("Invalid Chances", "Input chances as percentages between 0 and 100, such as `50 90 99`", error=True)
+            return
+
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type", error=True)
+            return
+
+        character, weapon = await self.starting(ctx.author, starting_pity_character, guaranteed_character, starting_pity_weapon, guaranteed_weapon, fate_points)
+
+        async with ctx.typing():
+            try:
+                distributions = await self.gather(constellations, refinements, character, weapon)
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            quantiles = Quantiles(cumulative(combine(*distributions)), self.worst_case(constellations, refinements, character, weapon))
+
+            needed = quantiles.get_pulls_needed(targets / 100)
+            actual = quantiles.get_probabilities(needed)
+
+            needed_summary = "\n".join([f"{target:g}%".rjust(6, " ") + f": {pulls_label(pulls, units)} ({chance*100:.2f}%)" for target, pulls, chance in zip(targets, needed, actual)])
+
+            cr_string = (f"C{constellations}" if constellations is not None else "") + (f"R{refinements}" if refinements is not None else "")
+
+            await ctx.replyEmbed(f"Pulls needed for {cr_string}", f"```{needed_summary}```")
+
+    @pulls.command()
+    async def allocate(self, ctx: ArcContext, budget: int, confidence: float = 50.0, starting_pity_character: int | None = None, guaranteed_character: bool | None = None, starting_pity_weapon: int | None = None, guaranteed_weapon: bool | None = None, fate_points: int | None = None):
+        if budget <= 0 or budget > 5000:
+            await ctx.replyEmbed("Invalid Budget", "Input a pull budget between 1 and 5000", error=True)
+            return
+
+        if confidence <= 0 or confidence > 100:
+            await ctx.replyEmbed("Invalid Confidence", "Input a confidence between 0 and 100", error=True)
+            return
+
+        if fate_points is not None and (fate_points > 2 or fate_points < 0):
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        if starting_pity_character is not None and starting_pity_character < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Character", "Input a valid starting pity - character", error=True)
+            return
+
+        if starting_pity_weapon is not None and starting_pity_weapon < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Weapon", "Input a valid starting pity - weapon", error=True)
+            return
+
+        character, weapon = await self.starting(ctx.author, starting_pity_character, guaranteed_character, starting_pity_weapon, guaranteed_weapon, fate_points)
+
+        async with ctx.typing():
+            try:
+                # The highest levels fill the cache for every lower one, so the rest are answered without computing
+                await asyncio.gather(self.compute(pulls_character, character, 6), self.compute(pulls_weapon, weapon, 5))
+
+                characters = await asyncio.gather(*[self.compute(pulls_character, character, c) for c in range(7)])
+                weapons = await asyncio.gather(*[self.compute(pulls_weapon, weapon, r) for r in range(1, 6)])
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            pulls = np.arange(budget + 1)
+
+            character_rows = np.array([Quantiles(cumulative(distribution)).get_probabilities(pulls) for distribution in characters])
+            # R0 stands for skipping the weapon banner and spending the whole budget on the character
+            weapon_rows = np.array([np.ones(budget + 1)] + [Quantiles(cumulative(distribution)).get_probabilities(pulls) for distribution in weapons])
+
+            best, splits = allocate_budget(character_rows, weapon_rows, budget)
+
+            grid = "\n".join(["    " + "".join(f"R{r}".rjust(7, " ") for r in range(best.shape[1]))] + [f"C{c}".ljust(4, " ") + "".join(f"{best[c, r]*100:.1f}".rjust(7, " ") for r in range(best.shape[1])) for c in range(best.shape[0])])
+
+            targets = frontier(best, confidence / 100)
+
+            if len(targets) > 0:
+                target_summary = "\n".join([f"C{c}R{r}: {splits[c, r]} character / {budget - splits[c, r]} weapon pulls ({best[c, r]*100:.2f}%)" for c, r in targets])
+            else:
+                target_summary = "No target reaches that confidence."
+
+            await ctx.replyEmbed(f"Allocating {budget} pulls", f"Best chance in percent for each target:\n```{grid}```Most ambitious targets with at least {confidence:g}%:\n```{target_summary}```")
+
+    @pulls.command()
+    async def sweep(self, ctx: ArcContext, banner: str, level: int, max_pulls: int, guaranteed: bool = False, fate_points: int = 0, pity_step: int = 10):
+        banner = banner.lower()
+
+        if banner not in ("character", "weapon"):
+            await ctx.replyEmbed("Invalid Banner", f"{banner} is not a valid banner, input character or weapon", error=True)
+            return
+
+        if banner == "character" and (level > 6 or level < 0):
+            await ctx.replyEmbed("Invalid Constellations", "Input a valid constellation count", error=True)
+            return
+
+        if banner == "weapon" and (level > 5 or level < 1):
+            await ctx.replyEmbed("Invalid Refinements", "Input a valid refinement count", error=True)
+            return
+
+        if max_pulls < 8 or max_pulls > 2000:
+            await ctx.replyEmbed("Invalid Pull Count", "Input a maximum pull count between 8 and 2000", error=True)
+            return
+
+        if fate_points > 2 or fate_points < 0:
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        if pity_step <= 0:
+            await ctx.replyEmbed("Invalid Pity Step", "Input a positive pity step", error=True)
+            return
+
+        pities = tuple(range(0, (CHARACTER_BANNER if banner == "character" else WEAPON_BANNER).certain + 1, pity_step))
+        pulls = tuple(int(round(max_pulls * (i + 1) / 8)) for i in range(8))
+
+        async with ctx.typing():
+            try:
+                chances = await self.compute(pulls_sweep, banner, level, guaranteed, fate_points, pities, pulls)
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            target = f"C{level}" if banner == "character" else f"R{level}"
+
+            await ctx.replyEmbed(f"Chances of {target} by starting pity and pull count", f"Chances in percent, one row per starting pity and one column per pull count.\n```{heatmap(chances, pities, pulls)}```")
+
+    @pulls.command()
+    async def plan(self, ctx: ArcContext, segments: str, pull_count: int, starting_pity_character: int | None = None, guaranteed_character: bool | None = None, starting_pity_weapon: int | None = None, guaranteed_weapon: bool | None = None, fate_points: int | None = None, units: str = "Pulls"):
+        parsed = parse_plan(segments)
+
+        if parsed is None or len(parsed) > 8:
+            await ctx.replyEmbed("Invalid Plan", "Input up to 8 banners in order, such as `C1 C0 R1`, each one C0 to C6 or R1 to R5", error=True)
+            return
+
+        if pull_count <= 0 or pull_count > MAX_PULL_COUNT:
+            await ctx.replyEmbed("Invalid Pull Count", f"Input a pull count between 1 and {MAX_PULL_COUNT}", error=True)
+            return
+
+        if fate_points is not None and (fate_points > 2 or fate_points < 0):
+            await ctx.replyEmbed("Invalid Fate Point Count", "Input a valid fate point count", error=True)
+            return
+
+        if starting_pity_character is not None and starting_pity_character < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Character", "Input a valid starting pity - character", error=True)
+            return
+
+        if starting_pity_weapon is not None and starting_pity_weapon < 0:
+            await ctx.replyEmbed("Invalid Starting Pity - Weapon", "Input a valid starting pity - weapon", error=True)
+            return
+
+        if units not in UNITS:
+            await ctx.replyEmbed("Invalid Units", f"{units} is not a valid unit type", error=True)
+            return
+
+        character, weapon = await self.starting(ctx.author, starting_pity_character, guaranteed_character, starting_pity_weapon, guaranteed_weapon, fate_points)
+
+        async with ctx.typing():
+            try:
+                prefixes = await self.compute(pulls_plan, character, weapon, parsed)
+            except asyncio.TimeoutError:
+                await ctx.replyEmbed("Computation Timed Out", "That query took too long to compute, please try again later", error=True)
+                return
+
+            chances = [probability_by(cumulative(prefix), pull_count) for prefix in prefixes]
+
+            plan_summary = "\n".join([f"{i + 1}. {' > '.join(parsed[:i + 1])}: {chance*100:.2f}%" for i, chance in enumerate(chances)])
+
+            await ctx.replyEmbed(f"Chances of {' > '.join(parsed)} by {pull_count} pulls", f"Pity and guarantees carry from each banner to the next, chances by {pulls_label(pull_count, units)}.\n```{plan_summary}```")
 
-            await ctx.replyEmbed(f"Percentiles for {cr_string}", f"```{percentile_summary}```")
 
+    @character.autocomplete('units')
+    @weapon.autocomplete('units')
+    @combined.autocomplete('units')
+    @percentiles.autocomplete('units')
+    @needed.autocomplete('units')
+    @plan.autocomplete('units')
+    async def units_autocomplete(self, interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
+        return [discord.app_commands.Choice(name=choice, value=choice) for choice in UNITS if current.lower() in choice.lower()]
 
     @property
     def color(self) -> discord.Color | None:
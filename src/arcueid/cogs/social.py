@@ -103,7 +103,12 @@ class SocialCog(ACog):
     def __init__(self, bot: 'ArcBot') -> None:
         super().__init__(bot)
 
-        self.voice_channels: defaultdict[int, GROUP] = defaultdict(dict)
+        self.voice_channels: dict[int, GROUP] = {}
+
+        # Indexes over voice_channels, a member is only ever in one voice channel and only occupied channels are kept
+        self.member_channels: dict[int, int] = {}
+        self.guild_channels: defaultdict[int, set[int]] = defaultdict(set)
+        self.channel_guilds: dict[int, int] = {}
     
     async def __ainit__(self) -> None:
         self.bot.logger.debug("Begin loading voice states into memory.")
@@ -120,44 +125,84 @@ class SocialCog(ACog):
                     pressence = VoicePressence.from_voice_state(member, voice_state)
 
                     if pressence is not None:
-                        self.voice_channels[vc.id][id] = pressence
+                        self.add_pressence(guild.id, vc.id, id, pressence)
 
         self.bot.logger.debug("Completed loading voice states into memory.")
 
+    def add_pressence(self, guild_id: int, channel_id: int, member_id: int, pressence: VoicePressence) -> None:
+        previous = self.member_channels.get(member_id)
+
+        # Joining a channel in another guild can arrive before leaving the last one, the old entry is dropped either way
+        if previous is not None and previous != channel_id:
+            self.remove_pressence(previous, member_id)
+
+        self.voice_channels.setdefault(channel_id, {})[member_id] = pressence
+        self.member_channels[member_id] = channel_id
+        self.channel_guilds[channel_id] = guild_id
+        self.guild_channels[guild_id].add(channel_id)
+
+    def remove_pressence(self, channel_id: int, member_id: int) -> None:
+        group = self.voice_channels.get(channel_id)
+
+        if group is None or member_id not in group:
+            return
+
+        del group[member_id]
+
+        if self.member_channels.get(member_id) == channel_id:
+            del self.member_channels[member_id]
+
+        if len(group) == 0:
+            del self.voice_channels[channel_id]
+
+            # Kept per channel, so the partition is found even for a channel deleted since
+            guild_id = self.channel_guilds.pop(channel_id)
+
+            self.guild_channels[guild_id].discard(channel_id)
+
+            if len(self.guild_channels[guild_id]) == 0:
+                del self.guild_channels[guild_id]
+
     @comms.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
-        old_group: Optional[GROUP] = None
-        new_group: Optional[GROUP] = None
-
+        # Nothing here awaits, so the channels and both indexes change together between events
         if before.channel is not None:
-            old_group = self.voice_channels[before.channel.id]
-            old_group.pop(member.id, None)
-        if after.channel is not None:
-            new_group = self.voice_channels[after.channel.id]
+            self.remove_pressence(before.channel.id, member.id)
 
+        if after.channel is not None:
             new = VoicePressence.from_voice_state(member, after)
 
             if new is not None:
-                new_group[member.id] = new
+                self.add_pressence(after.channel.guild.id, after.channel.id, member.id, new)
     
     def get_member_group(self, member: discord.Member) -> Optional[GROUP]:
-        for group in self.voice_channels.values():
-            if member.id in group:
-                return group
-        
-        return None
+        channel_id = self.member_channels.get(member.id)
+
+        if channel_id is None:
+            return None
+
+        return self.voice_channels.get(channel_id)
+
+    def get_guild_groups(self, guild: discord.Guild) -> dict[int, GROUP]:
+        return {channel_id: self.voice_channels[channel_id] for channel_id in self.guild_channels.get(guild.id, ())}
 
     async def get_visisble_groups(self, member: discord.Member) -> list[Group]:
         groups = []
 
-        for channel_id, group in self.voice_channels.items():
-            channel = self.bot.get_channel(channel_id)
+        for guild in member.mutual_guilds:
+            guild_member = guild.get_member(member.id)
+
+            if guild_member is None:
+                continue
+
+            for channel_id, group in self.get_guild_groups(guild).items():
+                channel = guild.get_channel(channel_id)
+
+                if channel is not None and channel.permissions_for(guild_member).connect:
+                    group = Group.from_dict(channel, group)
+                    if group is not None:
+                        groups.append(group)
 
-            if channel.guild.get_member(member.id) is not None and channel.permissions_for(member).connect:
-                group = Group.from_dict(channel, group)
-                if group is not None:
-                    groups.append(group)
-        
         return groups
     
     async def generate_embed_from_group(self, ctx: ArcContext, group: GROUP) -> discord.Embed:
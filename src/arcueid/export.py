@@ -0,0 +1,145 @@
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click
+import numpy as np
+
+from .cogs.genshin import (
+    CHARACTER_BANNER, CHARACTER_SOLVER, WEAPON_BANNER, WEAPON_SOLVER,
+    CharacterState, Quantiles, WeaponState, cumulative, pulls_character_levels, pulls_weapon_levels
+)
+
+
+__all__ = [
+    'export'
+]
+
+
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99, 100)
+
+LEVELS = {
+    'character': range(0, 7),
+    'weapon': range(1, 6)
+}
+
+
+def parameters(banner: str, pity_step: int) -> list[tuple[int, bool, int]]:
+    """Every distinct starting state of a banner as (pity, guaranteed, fate points), later pities share the certain pity's future"""
+    if banner == 'character':
+        return [(pity, guaranteed, 0) for guaranteed in (False, True) for pity in range(0, CHARACTER_BANNER.certain + 1, pity_step)]
+
+    return [
+        (pity, guaranteed, fate_points)
+        for fate_points in range(WEAPON_BANNER.spec.fate_points + 1)
+        for guaranteed in (False, True)
+        for pity in range(0, WEAPON_BANNER.certain + 1, pity_step)
+    ]
+
+
+def state(banner: str, pity: int, guaranteed: bool, fate_points: int) -> CharacterState | WeaponState:
+    if banner == 'character':
+        return CharacterState(pity, 0, guaranteed)
+
+    return WeaponState(pity, 0, guaranteed, fate_points)
+
+
+def distributions(banner: str, pity: int, guaranteed: bool, fate_points: int) -> dict[int, tuple[np.ndarray, int]]:
+    """Distribution and exact worst case for every level from one starting state, run in a worker process"""
+    initial = state(banner, pity, guaranteed, fate_points).normalized
+    levels = LEVELS[banner]
+
+    if banner == 'character':
+        results = pulls_character_levels(initial, levels[-1])
+
+        return {level: (results[level], CHARACTER_SOLVER.maximum(initial, level + 1)) for level in levels}
+
+    results = pulls_weapon_levels(initial, levels[-1])
+
+    return {level: (results[level], WEAPON_SOLVER.maximum(initial, level)) for level in levels}
+
+
+def write(directory: Path, banner: str, rows: list[tuple[int, bool, int, int, np.ndarray, int]]) -> tuple[Path, Path]:
+    length = max(len(distribution) for *_, distribution, _ in rows)
+
+    table = np.zeros((len(rows), length), dtype=np.float64)
+
+    for i, (*_, distribution, _) in enumerate(rows):
+        table[i, :len(distribution)] = distribution
+
+    pities = np.array([row[0] for row in rows], dtype=np.int16)
+    guaranteed = np.array([row[1] for row in rows], dtype=bool)
+    fate_points = np.array([row[2] for row in rows], dtype=np.int8)
+    levels = np.array([row[3] for row in rows], dtype=np.int8)
+
+    means = table @ np.arange(length, dtype=np.float64)
+    errors = np.maximum(1.0 - table.sum(axis=1), 0.0)
+
+    percentiles = np.array(
+        [Quantiles(cumulative(distribution), maximum).get_quantiles(np.array(PERCENTILES) / 100) for *_, distribution, maximum in rows]
+    )
+
+    csv_path = directory / f'{banner}.csv'
+
+    with csv_path.open('w', newline='') as file:
+        writer = csv.writer(file)
+
+        writer.writerow(['pity', 'guaranteed', 'fate_points', 'level', 'mean', 'error', *(f'p{percentile}' for percentile in PERCENTILES)])
+
+        for i in range(len(rows)):
+            writer.writerow([
+                pities[i], int(guaranteed[i]), fate_points[i], levels[i], f'{means[i]:.4f}', f'{errors[i]:.3e}',
+                *(f'{value:.2f}' for value in percentiles[i])
+            ])
+
+    # One column per parameter and a row of the distribution matrix per CSV row, indexed by pull count
+    array_path = directory / f'{banner}.npz'
+
+    np.savez_compressed(
+        array_path,
+        pity=pities,
+        guaranteed=guaranteed,
+        fate_points=fate_points,
+        level=levels,
+        mean=means,
+        error=errors,
+        percentile=np.array(PERCENTILES),
+        percentiles=percentiles,
+        distribution=table
+    )
+
+    return csv_path, array_path
+
+
+@click.command()
+@click.argument('directory', type=click.Path(file_okay=False, writable=True))
+@click.option('-b', '--banner', 'banners', type=click.Choice(list(LEVELS)), multiple=True, default=tuple(LEVELS), help='banners to export, all by default')
+@click.option('-w', '--workers', type=int, default=None, help='worker processes, every core by default')
+@click.option('--pity-step', type=click.IntRange(min=1), default=1, help='spacing between exported starting pities')
+def export(directory: str, banners: tuple[str, ...], workers: int | None, pity_step: int) -> None:
+    """Writes pull distributions and percentiles for every starting state of each banner to DIRECTORY"""
+    output = Path(directory)
+    output.mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn')) as executor:
+        for banner in banners:
+            space = parameters(banner, pity_step)
+
+            click.echo(f'Computing {len(space)} {banner} starting states')
+
+            results = executor.map(distributions, *zip(*((banner, *parameter) for parameter in space)), chunksize=8)
+
+            rows = [
+                (pity, guaranteed, fate_points, level, distribution, maximum)
+                for (pity, guaranteed, fate_points), levels in zip(space, results)
+                for level, (distribution, maximum) in levels.items()
+            ]
+
+            for path in write(output, banner, rows):
+                click.echo(f'Wrote {path}')
+
+
+if __name__ == '__main__':
+    export()
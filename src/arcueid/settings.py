@@ -12,6 +12,8 @@ class Settings:
     token: str
     google_credentials: str
     theme: int = 0xf1a7be
+    workers: int = 2
+    cache_directory: str = 'cache'
 
     def save(self, fp: Path) -> None:
         with fp.open('w') as settings:
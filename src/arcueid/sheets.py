@@ -0,0 +1,195 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Any, Awaitable, Callable, Generic, Optional, TypeVar
+
+import google.auth.transport.requests
+import pygsheets
+
+__all__ = [
+    'SPENT_SHEET',
+    'SpentSummary',
+    'PURCHASES_WORKSHEET',
+    'FIRST_PURCHASE_ROW',
+    'read_summary',
+    'read_purchases',
+    'SheetsConnection',
+    'StaleCache'
+]
+
+
+SPENT_SHEET = "175PMTH9KkWQfL08VLPvrZaBJfeFArToYZztikW2ky1U"
+
+V = TypeVar('V')
+
+
+@dataclass(frozen=True)
+class SpentSummary:
+    total: str
+    per_day: str
+    duration: str
+
+
+# Purchases are logged one per row on the second worksheet as date, amount and description under a header row
+PURCHASES_WORKSHEET = 1
+FIRST_PURCHASE_ROW = 2
+
+
+def read_summary(spreadsheet: Any) -> SpentSummary:
+    """Reads the summary cells with one batched range request, blocking so it belongs in a thread"""
+    summary = spreadsheet.worksheet()
+
+    rows = summary.get_values("B1", "B4", include_tailing_empty=True)
+
+    def cell(row: int) -> str:
+        return rows[row][0] if row < len(rows) and len(rows[row]) > 0 else ""
+
+    return SpentSummary(cell(0), cell(1), cell(3))
+
+
+def read_purchases(spreadsheet: Any, start: int) -> list[list[Any]]:
+    """Purchase rows from the given sheet row to the last filled one in one range request, values unformatted"""
+    purchases = spreadsheet.worksheet("index", PURCHASES_WORKSHEET)
+
+    return purchases.get_values(
+        f"A{start}", f"C{max(purchases.rows, start)}",
+        include_tailing_empty=True, include_tailing_empty_rows=False, value_render=pygsheets.ValueRenderOption.UNFORMATTED_VALUE
+    )
+
+
+# Backoff between failed authorizations, doubling from the first to the last
+AUTHORIZE_RETRY = (5.0, 600.0)
+
+# Tokens are refreshed this many seconds before they expire, so no command ever waits on a refresh
+REFRESH_MARGIN = 300.0
+
+
+def authorize(credentials: str) -> pygsheets.client.Client:
+    client = pygsheets.authorize(service_file=credentials)
+
+    refresh(client.oauth)
+
+    return client
+
+
+def refresh(credentials: Any) -> None:
+    credentials.refresh(google.auth.transport.requests.Request())
+
+
+def until_refresh(credentials: Any) -> float:
+    if credentials.expiry is None:
+        return REFRESH_MARGIN
+
+    # google-auth keeps expiry as a naive UTC datetime
+    remaining = (credentials.expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+
+    return max(remaining - REFRESH_MARGIN, AUTHORIZE_RETRY[0])
+
+
+class SheetsConnection:
+    """Authorizes with Google in a background task and keeps its token fresh, ready resolves to the client once usable"""
+    def __init__(self, credentials: str, logger: Logger) -> None:
+        self.credentials = credentials
+        self.logger = logger
+
+        self.ready: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self.task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    async def client(self, timeout: float) -> Any:
+        """The authorized client, raises asyncio.TimeoutError while authorization is still pending"""
+        self.start()
+
+        return await asyncio.wait_for(asyncio.shield(self.ready), timeout)
+
+    async def _run(self) -> None:
+        delay = AUTHORIZE_RETRY[0]
+
+        while True:
+            try:
+                client = await asyncio.to_thread(authorize, self.credentials)
+                break
+            except Exception:
+                self.logger.exception(f"Google authorization failed, retrying in {delay:.0f}s")
+
+            await asyncio.sleep(delay)
+
+            delay = min(delay * 2, AUTHORIZE_RETRY[1])
+
+        self.ready.set_result(client)
+
+        self.logger.info("Google Sheets authorized")
+
+        while True:
+            await asyncio.sleep(until_refresh(client.oauth))
+
+            try:
+                await asyncio.to_thread(refresh, client.oauth)
+            except Exception:
+                # The client still refreshes on demand, so a failure here only costs the next request some latency
+                self.logger.warning("Google token refresh failed", exc_info=True)
+
+
+class StaleCache(Generic[V]):
+    """One value kept fresh for ttl seconds, after that the stale value is served while a single background refresh runs"""
+    def __init__(self, ttl: float, fetch: Callable[[], Awaitable[V]], logger: Logger) -> None:
+        self.ttl = ttl
+        self.fetch = fetch
+        self.logger = logger
+
+        self.value: Optional[V] = None
+        self.fetched = 0.0
+
+        self.refreshing: Optional[asyncio.Task[V]] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def stale(self) -> bool:
+        return self.value is None or asyncio.get_running_loop().time() - self.fetched > self.ttl
+
+    async def get(self) -> V:
+        if self.value is None:
+            # Nothing to serve yet, so the first callers share and wait on one fetch
+            return await asyncio.shield(self.refresh())
+
+        if self.stale:
+            self.refresh()
+
+        return self.value
+
+    def refresh(self) -> asyncio.Task[V]:
+        if self.refreshing is None or self.refreshing.done():
+            self.refreshing = asyncio.ensure_future(self._fetch())
+            self.refreshing.add_done_callback(self._land)
+
+        return self.refreshing
+
+    def invalidate(self) -> None:
+        self.fetched = 0.0
+
+    async def _fetch(self) -> V:
+        value = await self.fetch()
+
+        self.value = value
+        self.fetched = asyncio.get_running_loop().time()
+        self.error = None
+
+        return value
+
+    def _land(self, task: asyncio.Task[V]) -> None:
+        # A failed background refresh keeps serving the stale value, so the failure is logged here or nowhere
+        if task.cancelled():
+            return
+
+        self.error = task.exception()
+
+        if self.error is not None:
+            self.logger.error("Background refresh failed, serving the stale value", exc_info=self.error)
@@ -0,0 +1,79 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+__all__ = [
+    'FlightStats',
+    'SingleFlight',
+    'FLIGHTS'
+]
+
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+@dataclass(frozen=True)
+class FlightStats:
+    hits: int
+    misses: int
+    coalesced: int
+    inflight: int
+
+    @property
+    def total(self) -> int:
+        return self.hits + self.misses + self.coalesced
+
+    def __str__(self) -> str:
+        return f'{self.hits} hits, {self.misses} misses, {self.coalesced} coalesced, {self.inflight} in flight.'
+
+
+class SingleFlight(Generic[K, V]):
+    """Coalesces concurrent requests for the same key onto one shared computation"""
+    def __init__(self, name: str, lookup: Callable[[K], Optional[V]]) -> None:
+        self.name = name
+        self.lookup = lookup
+
+        self.inflight: dict[K, asyncio.Task[V]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        FLIGHTS[name] = self
+
+    @property
+    def stats(self) -> FlightStats:
+        return FlightStats(self.hits, self.misses, self.coalesced, len(self.inflight))
+
+    async def run(self, key: K, factory: Callable[[], Awaitable[V]]) -> V:
+        result = self.lookup(key)
+
+        if result is not None:
+            self.hits += 1
+            return result
+
+        task = self.inflight.get(key)
+
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+
+            task = asyncio.ensure_future(factory())
+
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self._land(key, done))
+
+        # Shielded so one caller giving up never cancels the computation the others are waiting on
+        return await asyncio.shield(task)
+
+    def _land(self, key: K, task: asyncio.Task[V]) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+
+        if not task.cancelled():
+            task.exception()
+
+
+FLIGHTS: dict[str, SingleFlight] = {}
@@ -0,0 +1,215 @@
+import asyncio
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional, TypeVar
+
+from .sheets import FIRST_PURCHASE_ROW, SPENT_SHEET, SpentSummary, read_purchases, read_summary
+
+__all__ = [
+    'SYNC_OVERLAP',
+    'FULL_SYNC_INTERVAL',
+    'Purchase',
+    'Month',
+    'SpendingStore'
+]
+
+
+R = TypeVar('R')
+
+
+# Rows already mirrored that are read again on every sync, so recent edits above the last row are still picked up
+SYNC_OVERLAP = 50
+
+# Seconds between syncs that read the whole sheet, the only way edits above the overlap or rows shifted by a deletion reach the mirror
+FULL_SYNC_INTERVAL = 24 * 60 * 60
+
+# Day zero of spreadsheet serial dates
+SERIAL_EPOCH = date(1899, 12, 30)
+
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%d %B %Y', '%B %d, %Y')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    row INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    description TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS purchases_date ON purchases (date);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class Purchase(NamedTuple):
+    date: str
+    amount: float
+    description: str
+
+
+class Month(NamedTuple):
+    month: str
+    amount: float
+    purchases: int
+
+
+def parse_date(value: Any) -> str:
+    """An ISO date from an unformatted cell, either a serial day count or text in one of a few common formats"""
+    if isinstance(value, (int, float)):
+        return (SERIAL_EPOCH + timedelta(days=int(value))).isoformat()
+
+    text = str(value).strip()
+
+    for format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, format).date().isoformat()
+        except ValueError:
+            pass
+
+    return text
+
+
+def parse_amount(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = re.sub(r'[^0-9.\-]', '', str(value))
+
+    return float(text) if text not in ('', '-', '.') else 0.0
+
+
+class SpendingStore:
+    """SQLite mirror of the spending sheet, every query and sync runs on one dedicated thread that owns the connection"""
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='spending')
+        self.connection: Optional[sqlite3.Connection] = None
+
+    async def call(self, function: Callable[..., R], *args: Any) -> R:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            self.connection = sqlite3.connect(self.path)
+
+            # Readers never block the sync, and a sync only fsyncs at checkpoints
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+
+            self.connection.executescript(SCHEMA)
+
+        return self.connection
+
+    def meta(self, key: str) -> Optional[str]:
+        row = self.connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+
+        return row[0] if row is not None else None
+
+    def sync(self, client: Any, full: bool = False) -> bool:
+        """Brings the mirror up to date, only reading rows from just before the last mirrored one, returns whether any row changed
+
+        Once a day the whole sheet is read instead, so older edits are mirrored too."""
+        spreadsheet = client.open_by_key(SPENT_SHEET)
+
+        # The per day and duration cells are formulas over the current date, they change without the sheet being edited
+        summary = read_summary(spreadsheet)
+
+        revision = str(spreadsheet.updated)
+
+        connection = self.connect()
+
+        now = time.time()
+
+        full_synced = self.meta('full_synced')
+
+        full = full or full_synced is None or now - float(full_synced) >= FULL_SYNC_INTERVAL
+        changed = full or revision != self.meta('revision')
+
+        with connection:
+            if changed and self.sync_purchases(spreadsheet, full):
+                connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('full_synced', str(now)))
+
+            connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', (
+                ('revision', revision),
+                ('synced', str(now)),
+                ('total', summary.total),
+                ('per_day', summary.per_day),
+                ('duration', summary.duration)
+            ))
+
+        return changed
+
+    def sync_purchases(self, spreadsheet: Any, full: bool) -> bool:
+        """Mirrors the purchase rows, returns whether the whole sheet was read"""
+        mirrored = int(self.meta('rows') or FIRST_PURCHASE_ROW - 1)
+
+        start = FIRST_PURCHASE_ROW if full else max(FIRST_PURCHASE_ROW, mirrored - SYNC_OVERLAP + 1)
+
+        values = read_purchases(spreadsheet, start)
+
+        if start > FIRST_PURCHASE_ROW and start + len(values) - 1 < mirrored:
+            # Rows were deleted, so everything below them moved up and the whole sheet has to be read again
+            start = FIRST_PURCHASE_ROW
+            values = read_purchases(spreadsheet, start)
+
+        purchases = [
+            (start + i, parse_date(row[0]), parse_amount(row[1]), str(row[2]) if len(row) > 2 else '')
+            for i, row in enumerate(values)
+            if len(row) > 1 and row[0] != '' and row[1] != ''
+        ]
+
+        connection = self.connect()
+
+        connection.execute('DELETE FROM purchases WHERE row >= ?', (start,))
+        connection.executemany('INSERT INTO purchases VALUES (?, ?, ?, ?)', purchases)
+
+        connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('rows', str(start + len(values) - 1)))
+
+        return start == FIRST_PURCHASE_ROW
+
+    def summary(self) -> Optional[SpentSummary]:
+        """The summary cells as of the last sync, None before the first one"""
+        values = dict(self.connect().execute("SELECT key, value FROM meta WHERE key IN ('total', 'per_day', 'duration')").fetchall())
+
+        if len(values) < 3:
+            return None
+
+        return SpentSummary(values['total'], values['per_day'], values['duration'])
+
+    def synced(self) -> Optional[float]:
+        synced = self.meta('synced')
+
+        return float(synced) if synced is not None else None
+
+    def monthly(self, months: int) -> list[Month]:
+        """Spending per calendar month, most recent first"""
+        rows = self.connect().execute(
+            'SELECT substr(date, 1, 7) AS month, sum(amount), count(*) FROM purchases GROUP BY month ORDER BY month DESC LIMIT ?', (months,)
+        ).fetchall()
+
+        return [Month(*row) for row in rows]
+
+    def recent(self, count: int) -> list[Purchase]:
+        rows = self.connect().execute('SELECT date, amount, description FROM purchases ORDER BY row DESC LIMIT ?', (count,)).fetchall()
+
+        return [Purchase(*row) for row in rows]
+
+    def close(self) -> None:
+        def close() -> None:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+        self.executor.submit(close)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,92 @@
+from math import gcd
+from functools import reduce
+
+import numpy as np
+
+__all__ = [
+    'PACKS',
+    'PRIMOGEMS_PER_PULL',
+    'UNITS',
+    'TopUpTable',
+    'TOP_UPS',
+    'convert',
+    'format_units'
+]
+
+
+# Primogems gained and price in cents for each top up, first purchase bonuses aside, the last is a single crystal bundle
+PACKS = (
+    (6480 + 1600, 9999),
+    (3280 + 600, 4999),
+    (1980 + 260, 2999),
+    (980 + 110, 1499),
+    (300 + 30, 499),
+    (60, 99)
+)
+
+PRIMOGEMS_PER_PULL = 160
+
+UNITS = ("Pulls", "Optimal USD", "Minimal USD")
+
+
+# Pull counts the exact table covers, past them whole best packs are added, which is exact from well below this
+TABLE_PULLS = 1000
+
+
+class TopUpTable:
+    """Exact cheapest way to buy at least some number of pulls, a covering knapsack over the packs built once up front"""
+    def __init__(self, packs: tuple[tuple[int, int], ...] = PACKS, per_pull: int = PRIMOGEMS_PER_PULL, pulls: int = TABLE_PULLS) -> None:
+        # Every amount is a multiple of the common divisor, so the table steps in those units
+        self.step = reduce(gcd, [gained for gained, _ in packs], per_pull)
+
+        self.packs = [(gained // self.step, cost) for gained, cost in packs]
+        self.per_pull = per_pull // self.step
+
+        # Large purchases repeat the pack with the most primogems per cent
+        self.period, self.period_cost = max(self.packs, key=lambda pack: pack[0] / pack[1])
+
+        values = [0] * (pulls * self.per_pull + 1)
+
+        for a in range(1, len(values)):
+            values[a] = min(values[max(a - gained, 0)] + cost for gained, cost in self.packs)
+
+        self.costs = np.array(values, dtype=np.int64)
+
+    def cents(self, pulls: np.ndarray) -> np.ndarray:
+        amount = np.asarray(pulls, dtype=np.int64) * self.per_pull
+
+        # Whole periods past the end of the table, each one costs exactly one best pack
+        periods = np.maximum(-(-(amount - (len(self.costs) - 1)) // self.period), 0)
+
+        return self.costs[amount - periods * self.period] + periods * self.period_cost
+
+    def usd(self, pulls: np.ndarray) -> np.ndarray:
+        return self.cents(pulls) / 100
+
+
+TOP_UPS = TopUpTable()
+
+
+def convert(units: str, pulls: np.ndarray) -> np.ndarray:
+    """Pull counts in the given units, fractional pull counts are interpolated between whole ones"""
+    pulls = np.asarray(pulls, dtype=np.float64)
+
+    match units:
+        case "Minimal USD":
+            lower = np.floor(pulls)
+
+            return TOP_UPS.usd(lower) + (pulls - lower) * (TOP_UPS.usd(np.ceil(pulls)) - TOP_UPS.usd(lower))
+        case "Optimal USD":
+            # Every primogem bought at the best pack's rate, a lower bound on the real cost
+            gained, cost = PACKS[0]
+
+            return pulls * PRIMOGEMS_PER_PULL * cost / gained / 100
+
+    return pulls
+
+
+def format_units(units: str, value: float) -> str:
+    if units == "Pulls":
+        return f"{value:.2f}"
+
+    return f"${value:.2f}"
@@ -0,0 +1,282 @@
+import csv
+import json
+import os
+import re
+import tempfile
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional, TextIO
+
+import numpy as np
+
+__all__ = [
+    'STANDARD_FIVE_STARS',
+    'STANDARD_SINCE',
+    'POOLS',
+    'WishHistory',
+    'PoolState',
+    'read_history',
+    'pities',
+    'derive',
+    'pool_states',
+    'WishStore'
+]
+
+
+# Five stars that come from losing a featured roll, anything else on an event banner was featured
+STANDARD_FIVE_STARS = frozenset((
+    "Diluc", "Jean", "Keqing", "Mona", "Qiqi", "Tighnari", "Dehya",
+    "Amos' Bow", "Aquila Favonia", "Lost Prayer to the Sacred Winds", "Primordial Jade Winged-Spear", "Skyward Atlas",
+    "Skyward Blade", "Skyward Harp", "Skyward Pride", "Skyward Spine", "Wolf's Gravestone"
+))
+
+# Five stars featured on their own banners before joining the standard pool with a later version, wished before then they were featured
+STANDARD_SINCE = {
+    "Tighnari": int(datetime(2022, 9, 28, tzinfo=timezone.utc).timestamp()),
+    "Dehya": int(datetime(2023, 4, 12, tzinfo=timezone.utc).timestamp())
+}
+
+# Gacha types sharing each banner's pity, both character event banners count towards one pity
+POOLS = {
+    'character': (301, 400),
+    'weapon': (302,)
+}
+
+CHUNK_SIZE = 1 << 16
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+LIST_KEY = re.compile(r'"list"\s*:\s*\[')
+SEPARATOR = re.compile(r'[\s,]*')
+
+
+@dataclass(frozen=True)
+class WishHistory:
+    """One user's wishes as parallel columns sorted by wish id, which orders them in time"""
+    id: np.ndarray
+    time: np.ndarray
+    gacha_type: np.ndarray
+    rank: np.ndarray
+    standard: np.ndarray
+    item: np.ndarray
+    names: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def pool(self, pool: str) -> np.ndarray:
+        return np.isin(self.gacha_type, POOLS[pool])
+
+    def merge(self, other: 'WishHistory') -> 'WishHistory':
+        """Both histories with overlapping wishes kept once, so the same export can be imported again"""
+        names, item = np.unique(np.concatenate([self.names[self.item], other.names[other.item]]), return_inverse=True)
+
+        columns = {name: np.concatenate([getattr(self, name), getattr(other, name)]) for name in ('id', 'time', 'gacha_type', 'rank', 'standard')}
+
+        _, first = np.unique(columns['id'], return_index=True)
+
+        return WishHistory(**{name: column[first] for name, column in columns.items()}, item=item[first].astype(np.int32), names=names)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written to a file of its own beside the old one and swapped in, a reader never sees half a history
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.stem, suffix='.tmp.npz', delete=False) as file:
+            try:
+                np.savez(file, **{name: getattr(self, name) for name in ('id', 'time', 'gacha_type', 'rank', 'standard', 'item', 'names')})
+            except BaseException:
+                file.close()
+                os.unlink(file.name)
+
+                raise
+
+        os.replace(file.name, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'WishHistory':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+def stream_json(file: TextIO) -> Iterator[dict]:
+    """The records of the first wish list in a JSON export such as UIGF, decoded one at a time from fixed size chunks"""
+    decoder = json.JSONDecoder()
+
+    buffer = ''
+
+    def fill() -> bool:
+        nonlocal buffer
+
+        chunk = file.read(CHUNK_SIZE)
+        buffer += chunk
+
+        return chunk != ''
+
+    # Everything before the list, such as the uid and exporter, is skipped without being decoded
+    while (match := LIST_KEY.search(buffer)) is None:
+        buffer = buffer[-16:]
+
+        if not fill():
+            raise ValueError("No wish list found in the file")
+
+    position = match.end()
+
+    while True:
+        position = SEPARATOR.match(buffer, position).end()
+
+        if position == len(buffer):
+            if not fill():
+                raise ValueError("The wish list ends unexpectedly")
+
+            continue
+
+        if buffer[position] == ']':
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Either a record split across chunks or a broken file, only more input tells them apart
+            if not fill():
+                raise ValueError("The wish list is not valid JSON") from None
+
+            continue
+
+        if not isinstance(record, dict):
+            raise ValueError("Every wish in the list must be an object")
+
+        yield record
+
+        if position > CHUNK_SIZE:
+            buffer, position = buffer[position:], 0
+
+
+def stream_records(file: TextIO) -> Iterator[dict]:
+    """Wish records from a JSON or CSV export, told apart by the first character"""
+    while (first := file.read(1)).isspace():
+        pass
+
+    file.seek(0)
+
+    if first == '{':
+        return stream_json(file)
+
+    return csv.DictReader(file)
+
+
+def read_history(records: Iterable[dict]) -> WishHistory:
+    """Packs wish records into typed columns as they stream in, no record outlives its own row"""
+    ids, times = array('q'), array('q')
+    gacha_types, ranks, standard, items = array('h'), array('b'), array('b'), array('i')
+
+    names: dict[str, int] = {}
+
+    for number, record in enumerate(records, 1):
+        try:
+            name = record['name']
+
+            time = int(datetime.strptime(record['time'], TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+
+            ids.append(int(record['id']))
+            times.append(time)
+            # UIGF folds the second character event banner into the first, the raw type is kept when present
+            gacha_types.append(int(record.get('gacha_type') or record['uigf_gacha_type']))
+            ranks.append(int(record['rank_type']))
+            standard.append(name in STANDARD_FIVE_STARS and time >= STANDARD_SINCE.get(name, 0))
+            items.append(names.setdefault(name, len(names)))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Wish {number} could not be read: {e}") from None
+
+    history = WishHistory(
+        id=np.frombuffer(ids, dtype=np.int64),
+        time=np.frombuffer(times, dtype=np.int64),
+        gacha_type=np.frombuffer(gacha_types, dtype=np.int16),
+        rank=np.frombuffer(ranks, dtype=np.int8),
+        standard=np.frombuffer(standard, dtype=np.int8).astype(bool),
+        item=np.frombuffer(items, dtype=np.int32),
+        names=np.array(list(names), dtype=str)
+    )
+
+    # Exports list wishes newest first, sorting by id puts every format in time order
+    order = np.argsort(history.id, kind='stable')
+
+    return WishHistory(**{name: getattr(history, name)[order] for name in ('id', 'time', 'gacha_type', 'rank', 'standard', 'item')}, names=history.names)
+
+
+class PoolState(NamedTuple):
+    pity: int
+    guaranteed: bool
+    pulls: int
+
+
+def pities(rank: np.ndarray) -> np.ndarray:
+    """The pity each wish was made at, the number of wishes since the last five star before it"""
+    index = np.arange(len(rank))
+
+    # Index of the latest five star strictly before each wish, -1 before the first one
+    last = np.maximum.accumulate(np.where(rank == 5, index, -1))
+    before = np.concatenate([[-1], last[:-1]])
+
+    return index - before - 1
+
+
+def derive(history: WishHistory, pool: str) -> PoolState:
+    """Current pity and guarantee of one banner from its wishes
+
+    A standard five star lost the featured roll, so the next one is guaranteed, and the guarantee carries over to later
+    banners. Fate points reset with every banner and exports do not record which banner a wish was made on, so they are
+    not derived at all."""
+    mask = history.pool(pool)
+
+    rank, standard = history.rank[mask], history.standard[mask]
+
+    if len(rank) == 0:
+        return PoolState(0, False, 0)
+
+    # The pity of the next wish, as if a three star were appended
+    pity = int(pities(np.append(rank, 3))[-1])
+
+    lost = standard[rank == 5]
+
+    return PoolState(pity, len(lost) > 0 and bool(lost[-1]), len(rank))
+
+
+def pool_states(history: WishHistory) -> dict[str, PoolState]:
+    return {pool: derive(history, pool) for pool in POOLS}
+
+
+class WishStore:
+    """Imported wish histories, one columnar file per user"""
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def path(self, user: int) -> Path:
+        return self.directory / f'{user}.npz'
+
+    def load(self, user: int) -> Optional[WishHistory]:
+        path = self.path(user)
+
+        if not path.exists():
+            return None
+
+        return WishHistory.load(path)
+
+    def import_file(self, user: int, path: Path) -> tuple[int, WishHistory]:
+        """Merges an export file into the user's history, returns how many wishes were new and the merged history"""
+        with path.open('r', encoding='utf-8-sig', newline='') as file:
+            imported = read_history(stream_records(file))
+
+        existing = self.load(user)
+
+        merged = imported if existing is None else existing.merge(imported)
+
+        merged.save(self.path(user))
+
+        return len(merged) - (0 if existing is None else len(existing)), merged
+
+    def states(self, user: int) -> Optional[dict[str, PoolState]]:
+        history = self.load(user)
+
+        return pool_states(history) if history is not None else None
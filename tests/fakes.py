@@ -0,0 +1,99 @@
+import time
+from typing import Any, Optional
+
+__all__ = [
+    'FakeWorksheet',
+    'FakeSpreadsheet',
+    'FakeClient'
+]
+
+
+def cell_index(address: str) -> tuple[int, int]:
+    """Zero based row and column of an A1 style address such as B4"""
+    column = ord(address[0].upper()) - ord("A")
+
+    return int(address[1:]) - 1, column
+
+
+class FakeWorksheet:
+    """In memory stand in for a pygsheets worksheet, a grid of rows addressed like B1"""
+    def __init__(self, spreadsheet: "FakeSpreadsheet", values: list[list[Any]]) -> None:
+        self.spreadsheet = spreadsheet
+        self.values = values
+
+    @property
+    def rows(self) -> int:
+        return max(len(self.values), 1)
+
+    def get_value(self, address: str) -> Any:
+        return self.get_values(address, address)[0][0]
+
+    def get_values(self, start: str, end: str, include_tailing_empty_rows: bool = True, **kwargs: Any) -> list[list[Any]]:
+        time.sleep(self.spreadsheet.latency)
+
+        self.spreadsheet.reads.append((start, end))
+
+        (top, left), (bottom, right) = cell_index(start), cell_index(end)
+
+        rows = [
+            [row[column] if column < len(row) else "" for column in range(left, right + 1)]
+            for row in (self.values[i] if i < len(self.values) else [] for i in range(top, bottom + 1))
+        ]
+
+        if not include_tailing_empty_rows:
+            while len(rows) > 0 and all(value == "" for value in rows[-1]):
+                rows.pop()
+
+        return rows
+
+    def set_value(self, address: str, value: Any) -> None:
+        row, column = cell_index(address)
+
+        while len(self.values) <= row:
+            self.values.append([])
+
+        self.values[row].extend([""] * (column + 1 - len(self.values[row])))
+        self.values[row][column] = value
+
+        self.spreadsheet.revision += 1
+
+    def append_table(self, values: list[list[Any]]) -> None:
+        self.values.extend(list(row) for row in values)
+
+        self.spreadsheet.revision += 1
+
+
+class FakeSpreadsheet:
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.revision = 0
+
+        # Every range read, so tests can see how much of the sheet a sync touched
+        self.reads: list[tuple[str, str]] = []
+
+        self.worksheets: list[FakeWorksheet] = []
+
+    @property
+    def updated(self) -> str:
+        return str(self.revision)
+
+    def worksheet(self, property: str = "index", value: int = 0) -> FakeWorksheet:
+        return self.worksheets[value]
+
+
+class FakeClient:
+    """Answers every open_by_key with the same in memory spreadsheet, a summary sheet and a purchases sheet"""
+    def __init__(self, summary: Optional[dict[str, str]] = None, purchases: Optional[list[list[Any]]] = None, latency: float = 0.0) -> None:
+        if summary is None:
+            summary = {"B1": "$0.00", "B2": "$0.00", "B4": "0"}
+
+        self.spreadsheet = FakeSpreadsheet(latency)
+
+        self.spreadsheet.worksheets.append(FakeWorksheet(self.spreadsheet, []))
+        self.spreadsheet.worksheets.append(FakeWorksheet(self.spreadsheet, [["Date", "Amount", "Description"], *(purchases or [])]))
+
+        for address, value in summary.items():
+            self.spreadsheet.worksheets[0].set_value(address, value)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        return self.spreadsheet
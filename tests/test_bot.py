@@ -0,0 +1,59 @@
+import asyncio
+import time
+from typing import Iterator
+
+import pytest
+
+from arcueid.bot import ArcBot
+from arcueid.datastructures import PassthroughInfo
+from arcueid.settings import Settings
+
+
+@pytest.fixture
+def bot() -> Iterator[ArcBot]:
+    bot = ArcBot(Settings('token', 'credentials', workers=2), PassthroughInfo())
+
+    yield bot
+
+    bot.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_timeout_terminates_workers(bot: ArcBot) -> None:
+    async def run() -> None:
+        executor = bot.executor
+
+        # Start both workers first so there is a running process to terminate
+        await asyncio.gather(bot.compute(abs, -1), bot.compute(abs, -2))
+
+        processes = list(executor._processes.values())
+
+        with pytest.raises(asyncio.TimeoutError):
+            await bot.compute(time.sleep, 60, timeout=0.5)
+
+        assert bot.executor is not executor
+
+        for process in processes:
+            process.join(5)
+
+            assert not process.is_alive()
+
+        assert await bot.compute(abs, -3) == 3
+
+    asyncio.run(run())
+
+
+def test_other_calls_rerun_on_the_new_pool(bot: ArcBot) -> None:
+    async def run() -> None:
+        executor = bot.executor
+
+        # Still running when the other call times out, so its worker is terminated too
+        survivor = asyncio.ensure_future(bot.compute(time.sleep, 2, timeout=30))
+        doomed = asyncio.ensure_future(bot.compute(time.sleep, 60, timeout=1))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await doomed
+
+        assert bot.executor is not executor
+        assert await survivor is None
+
+    asyncio.run(run())
@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from arcueid.banners import BANNERS, BannerSpec, compile_banner
+from arcueid.benchmark import consistency
+from arcueid.cogs.gacha import MonteCarloResult, RunningStats, converged, simulate_batch, simulate_parallel, unit_values
+from arcueid.cogs.genshin import (
+    CHARACTER_SOLVER, WEAPON_SOLVER, BannerSimulation, BannerState, CharacterSimulation, CharacterState, Quantiles,
+    WeaponSimulation, WeaponState,
+    combine, cumulative, pulls_character, pulls_sweep, pulls_weapon, to_cumulative
+)
+
+
+@pytest.mark.parametrize('result', consistency(), ids=lambda result: result['engine'])
+def test_engines_agree(result: dict) -> None:
+    assert result['passed'], f"{result['engine']} is off by {result['max_difference']:.3e}"
+
+
+def test_to_cumulative_matches_cumulative() -> None:
+    reference = CharacterSimulation(CharacterState(0, 0, False)).simulate_to_goal(CharacterState(0, 1, False))
+
+    dense = np.array([reference.get(i, 0.0) for i in range(max(reference) + 1)])
+    mapped = to_cumulative(reference)
+
+    assert np.allclose([mapped[i] for i in range(1, len(dense))], cumulative(dense)[1:], rtol=0, atol=1e-12)
+
+
+def test_distributions_sum_to_one_within_precision() -> None:
+    for distribution in (pulls_character(CharacterState(0, 0, False), 6), pulls_weapon(WeaponState(0, 0, False, 0), 5)):
+        assert 0 <= 1.0 - distribution.sum() < 1e-6
+        assert np.all(distribution >= 0)
+
+
+def test_hard_pity_is_certain() -> None:
+    distribution = pulls_character(CharacterState(BANNERS['character'].certain, 0, True), 0)
+
+    assert distribution[1] == pytest.approx(1.0)
+
+
+@pytest.fixture
+def quantiles() -> Quantiles:
+    initial = CharacterState(0, 0, False)
+
+    return Quantiles(cumulative(pulls_character(initial, 0)), CHARACTER_SOLVER.maximum(initial, 1))
+
+
+def test_quantiles_certain_is_worst_case(quantiles: Quantiles) -> None:
+    assert quantiles.cumulative[-1] < 1.0
+
+    assert quantiles.get_quantile(1.0) == quantiles.maximum == 180
+    assert quantiles.get_pulls_needed(np.array([1.0]))[0] == 180
+
+
+def test_quantiles_round_trip(quantiles: Quantiles) -> None:
+    chances = np.array([0.01, 0.5, 0.9, 0.99])
+
+    needed = quantiles.get_pulls_needed(chances)
+
+    # The fewest pulls reaching each chance, one pull fewer falls short of it
+    assert np.all(quantiles.get_probabilities(needed) >= chances)
+    assert np.all(quantiles.get_probabilities(needed - 1) < chances)
+
+
+def test_quantiles_interpolate_monotonically(quantiles: Quantiles) -> None:
+    values = quantiles.get_quantiles(np.linspace(0.001, 1.0, 1000))
+
+    assert np.all(np.diff(values) >= 0)
+    assert values[0] > 0
+
+
+def test_quantiles_past_the_end(quantiles: Quantiles) -> None:
+    assert np.all(quantiles.get_probabilities(np.array([180, 181, 10_000])) == 1.0)
+    assert quantiles.get_probabilities(np.array([0]))[0] == 0.0
+
+
+def test_quantiles_accept_mappings() -> None:
+    mapping = {1: 0.25, 2: 0.5, 3: 1.0}
+
+    assert np.array_equal(Quantiles(mapping).cumulative, [0.0, 0.25, 0.5, 1.0])
+
+
+def test_combine_is_convolution() -> None:
+    a, b = pulls_character(CharacterState(0, 0, False), 0), pulls_weapon(WeaponState(0, 0, False, 0), 1)
+
+    assert np.allclose(combine(a, b), np.convolve(a, b), atol=1e-12)
+
+
+@pytest.mark.parametrize('packed', (False, True))
+def test_banner_state_matches_dedicated_states(packed: bool) -> None:
+    generic = BannerSimulation(BannerState(30, 0, True, 0), packed=packed, banner=BANNERS['character']).simulate_to_goal(BannerState(0, 2, False, 0))
+    character = CharacterSimulation(CharacterState(30, 0, True), packed=packed).simulate_to_goal(CharacterState(0, 2, False))
+
+    assert generic.keys() == character.keys()
+    assert np.allclose([generic[i] for i in character], list(character.values()), rtol=0, atol=1e-12)
+
+    generic = BannerSimulation(BannerState(10, 0, False, 1), packed=packed, banner=BANNERS['weapon']).simulate_to_goal(BannerState(0, 2, False, 0))
+    weapon = WeaponSimulation(WeaponState(10, 0, False, 1), packed=packed).simulate_to_goal(WeaponState(0, 2, False, 0))
+
+    assert np.allclose([generic[i] for i in weapon], list(weapon.values()), rtol=0, atol=1e-12)
+
+
+def test_new_banner_from_spec_alone() -> None:
+    # A 50/50 banner with a single fate point, defined only as a spec without any classes of its own
+    banner = compile_banner(BannerSpec('chronicled', 0.006, 74, 0.06, 90, 0.5, featured=1, fate_points=1))
+
+    distribution = BannerSimulation(BannerState(0, 0, False, 0), banner=banner).simulate_to_goal_array(BannerState(0, 2, False, 0))
+
+    assert distribution.sum() == pytest.approx(1.0)
+
+    pulls = np.arange(len(distribution))
+    mean = distribution @ pulls
+    deviation = np.sqrt(distribution @ (pulls - mean) ** 2)
+
+    sampled = simulate_batch(banner, 2, 200_000, rng=np.random.default_rng(11))
+
+    assert abs(sampled.mean() - mean) < 4 * deviation / np.sqrt(len(sampled))
+    assert sampled.max() < len(distribution)
+
+
+def test_sweep_matches_distributions() -> None:
+    pities, pulls = (0, 40, 85), (150, 0, 10, 90)
+
+    values = pulls_sweep('character', 1, False, 0, pities, pulls)
+
+    assert values.shape == (len(pities), len(pulls))
+
+    for pity, row in zip(pities, values):
+        expected = np.append(cumulative(pulls_character(CharacterState(pity, 0, False), 1)), 1.0)
+
+        assert np.allclose(row, [expected[min(count, len(expected) - 1)] for count in pulls], atol=1e-6)
+
+
+def test_seeded_monte_carlo_matches_exact() -> None:
+    initial = WeaponState(20, 0, False, 1)
+    distribution = pulls_weapon(initial, 2)
+
+    pulls = np.arange(len(distribution))
+    mean = distribution @ pulls
+    deviation = np.sqrt(distribution @ (pulls - mean) ** 2)
+
+    def run(workers: int) -> MonteCarloResult:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return simulate_parallel(BANNERS['weapon'], 2, 300_000, 20, False, 1, seed=7, executor=executor)
+
+    result = run(2)
+
+    # Fixed size seeded chunks give the same histogram whatever runs them
+    assert np.array_equal(result.histogram, run(1).histogram)
+
+    assert result.seed == 7
+    assert abs(result.mean - mean) < 4 * deviation / np.sqrt(result.trials)
+    assert int(np.flatnonzero(result.histogram)[-1]) <= WEAPON_SOLVER.maximum(initial, 2)
+
+
+@pytest.mark.parametrize('banner, pity, fate_points', [('character', -5, 0), ('character', 0, 1), ('weapon', 0, -1), ('weapon', 0, 3)])
+def test_simulate_batch_rejects_impossible_states(banner: str, pity: int, fate_points: int) -> None:
+    with pytest.raises(ValueError):
+        simulate_batch(BANNERS[banner], 1, 10, pity, False, fate_points)
+
+
+def test_converged_at_displayed_precision() -> None:
+    stats = RunningStats()
+
+    assert not converged(stats, "Pulls")
+
+    # Every trial needs exactly 80 pulls, so the mean has no spread at all
+    histogram = np.zeros(81, dtype=np.int64)
+    histogram[80] = 1000
+
+    stats.add(histogram, unit_values("Pulls", len(histogram)))
+
+    assert converged(stats, "Pulls")
+
+    histogram[40] = 1000
+
+    spread = RunningStats()
+    spread.add(histogram, unit_values("Minimal USD", len(histogram)))
+
+    # Half need 40 pulls and half 80, a thousand of each pins the mean nowhere near a cent
+    assert not converged(spread, "Minimal USD")
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+
+import pytest
+
+from arcueid.sheets import SPENT_SHEET, SpentSummary, StaleCache, read_purchases, read_summary
+
+from .fakes import FakeClient
+
+
+LOGGER = logging.getLogger('tests')
+
+
+def test_read_summary() -> None:
+    client = FakeClient({'B1': '$120.00', 'B2': '$1.50', 'B4': '12'})
+
+    assert read_summary(client.open_by_key(SPENT_SHEET)) == SpentSummary('$120.00', '$1.50', '12')
+
+
+def test_read_summary_missing_cells() -> None:
+    client = FakeClient({'B1': '$5.00'})
+
+    assert read_summary(client.open_by_key(SPENT_SHEET)) == SpentSummary('$5.00', '', '')
+
+
+def test_read_purchases_from_row() -> None:
+    client = FakeClient(purchases=[[45000 + i, i, f'item {i}'] for i in range(5)])
+
+    rows = read_purchases(client.open_by_key(SPENT_SHEET), 4)
+
+    assert rows == [[45002, 2, 'item 2'], [45003, 3, 'item 3'], [45004, 4, 'item 4']]
+
+
+def test_read_purchases_past_the_end() -> None:
+    client = FakeClient(purchases=[[45000, 1, 'item']])
+
+    assert read_purchases(client.open_by_key(SPENT_SHEET), 10) == []
+
+
+class Source:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.failing = False
+        self.release = asyncio.Event()
+
+    async def fetch(self) -> int:
+        self.calls += 1
+
+        await self.release.wait()
+
+        if self.failing:
+            raise RuntimeError('sheet unavailable')
+
+        return self.calls
+
+
+def test_stale_cache_first_callers_share_one_fetch() -> None:
+    async def run() -> None:
+        source = Source()
+        cache = StaleCache(60.0, source.fetch, LOGGER)
+
+        waiting = asyncio.gather(cache.get(), cache.get(), cache.get())
+
+        await asyncio.sleep(0)
+        source.release.set()
+
+        assert await waiting == [1, 1, 1]
+        assert source.calls == 1
+
+    asyncio.run(run())
+
+
+def test_stale_cache_serves_stale_value_while_refreshing() -> None:
+    async def run() -> None:
+        source = Source()
+        source.release.set()
+
+        cache = StaleCache(60.0, source.fetch, LOGGER)
+
+        assert await cache.get() == 1
+
+        cache.invalidate()
+        source.release.clear()
+
+        # Stale, so the old value comes back at once and one refresh starts behind it
+        assert await cache.get() == 1
+        assert await cache.get() == 1
+
+        await asyncio.sleep(0)
+        assert source.calls == 2
+
+        source.release.set()
+        await cache.refreshing
+
+        assert await cache.get() == 2
+        assert not cache.stale
+
+    asyncio.run(run())
+
+
+def test_stale_cache_logs_failed_refresh(caplog: pytest.LogCaptureFixture) -> None:
+    async def run() -> None:
+        source = Source()
+        source.release.set()
+
+        cache = StaleCache(60.0, source.fetch, LOGGER)
+
+        await cache.get()
+
+        source.failing = True
+        cache.invalidate()
+
+        assert await cache.get() == 1
+
+        with pytest.raises(RuntimeError):
+            await cache.refreshing
+
+        await asyncio.sleep(0)
+
+        assert isinstance(cache.error, RuntimeError)
+        assert await cache.get() == 1
+
+    with caplog.at_level(logging.ERROR, logger='tests'):
+        asyncio.run(run())
+
+    assert 'Background refresh failed' in caplog.text
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import random
+from types import SimpleNamespace
+
+from arcueid.cogs.social import SocialCog
+
+
+GUILDS = [SimpleNamespace(id=1000 + i) for i in range(4)]
+CHANNELS = [SimpleNamespace(id=i, guild=GUILDS[i % len(GUILDS)]) for i in range(12)]
+
+
+def voice(channel: SimpleNamespace | None) -> SimpleNamespace:
+    return SimpleNamespace(channel=channel, deaf=False, self_deaf=False, mute=False, self_mute=False, afk=False, self_stream=False, self_video=False)
+
+
+def social(guilds: tuple = ()) -> SocialCog:
+    return SocialCog(SimpleNamespace(guilds=guilds, logger=logging.getLogger('tests')))
+
+
+def update(cog: SocialCog, member_id: int, before: SimpleNamespace | None, after: SimpleNamespace | None) -> None:
+    guild = (after or before).guild
+
+    asyncio.run(cog.on_voice_state_update(SimpleNamespace(id=member_id, guild=guild), voice(before), voice(after)))
+
+
+def test_indexes_follow_random_updates() -> None:
+    cog = social()
+    rng = random.Random(3)
+
+    where: dict[int, SimpleNamespace] = {}
+
+    for _ in range(5000):
+        member_id = rng.randrange(100)
+        after = rng.choice([None, *CHANNELS])
+
+        if after is None and member_id not in where:
+            continue
+
+        update(cog, member_id, where.get(member_id), after)
+
+        if after is None:
+            del where[member_id]
+        else:
+            where[member_id] = after
+
+    assert cog.member_channels == {member_id: channel.id for member_id, channel in where.items()}
+
+    occupied: dict[int, set[int]] = {}
+
+    for member_id, channel in where.items():
+        occupied.setdefault(channel.id, set()).add(member_id)
+
+    assert {channel_id: set(group) for channel_id, group in cog.voice_channels.items()} == occupied
+
+    assert dict(cog.guild_channels) == {
+        guild.id: {channel.id for channel in CHANNELS if channel.guild is guild and channel.id in occupied}
+        for guild in GUILDS if any(CHANNELS[channel_id].guild is guild for channel_id in occupied)
+    }
+
+    for member_id in range(100):
+        group = cog.get_member_group(SimpleNamespace(id=member_id))
+
+        assert (group is None) == (member_id not in where)
+        assert group is None or member_id in group
+
+
+def test_join_before_leave_across_guilds() -> None:
+    cog = social()
+
+    update(cog, 7, None, CHANNELS[0])
+    update(cog, 7, None, CHANNELS[1])
+    update(cog, 7, CHANNELS[0], None)
+
+    assert cog.member_channels == {7: CHANNELS[1].id}
+    assert list(cog.voice_channels) == [CHANNELS[1].id]
+    assert dict(cog.guild_channels) == {CHANNELS[1].guild.id: {CHANNELS[1].id}}
+
+
+def test_load_tolerates_uncached_members() -> None:
+    channel = SimpleNamespace(id=5, voice_states={42: voice(SimpleNamespace(id=5))})
+    guild = SimpleNamespace(id=1, voice_channels=[channel], get_member=lambda id: None)
+
+    cog = social((guild,))
+
+    asyncio.run(cog.__ainit__())
+
+    assert cog.member_channels == {42: 5}
+    assert cog.get_guild_groups(guild).keys() == {5}
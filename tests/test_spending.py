@@ -0,0 +1,154 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from arcueid.spending import FULL_SYNC_INTERVAL, SYNC_OVERLAP, Month, Purchase, SpendingStore, parse_amount, parse_date
+
+from .fakes import FakeClient
+
+
+PURCHASES = 200
+
+
+@pytest.fixture
+def client() -> FakeClient:
+    # Serial dates one day apart from 2023-03-15 to 2023-09-30
+    return FakeClient({'B1': '$100.00', 'B2': '$1.00', 'B4': '10'}, [[45000 + i, 5 + i % 3, f'item {i}'] for i in range(PURCHASES)])
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Iterator[SpendingStore]:
+    store = SpendingStore(tmp_path / 'spending.sqlite3')
+
+    yield store
+
+    store.close()
+
+
+def mirrored(store: SpendingStore) -> list[tuple]:
+    return store.connect().execute('SELECT * FROM purchases ORDER BY row').fetchall()
+
+
+def test_parse_date() -> None:
+    assert parse_date(45000) == '2023-03-15'
+    assert parse_date('01/15/2023') == '2023-01-15'
+    assert parse_date('2023-01-15') == '2023-01-15'
+
+
+def test_parse_amount() -> None:
+    assert parse_amount(4.99) == 4.99
+    assert parse_amount('$1,234.50') == 1234.5
+    assert parse_amount('') == 0.0
+
+
+def test_first_sync_mirrors_everything(client: FakeClient, store: SpendingStore) -> None:
+    assert store.summary() is None
+
+    assert store.sync(client)
+
+    assert len(mirrored(store)) == PURCHASES
+    assert store.summary().total == '$100.00'
+    assert store.recent(1) == [Purchase('2023-09-30', 5 + (PURCHASES - 1) % 3, f'item {PURCHASES - 1}')]
+
+
+def test_unchanged_sheet_only_reads_summary(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+    client.spreadsheet.reads.clear()
+
+    assert not store.sync(client)
+
+    assert client.spreadsheet.reads == [('B1', 'B4')]
+
+
+def test_summary_formulas_refresh_without_edits(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+
+    # A recalculated formula changes the value without the sheet counting as modified
+    summary = client.spreadsheet.worksheets[0]
+    summary.values[1][1] = '$0.90'
+
+    store.sync(client)
+
+    assert store.summary().per_day == '$0.90'
+
+
+def test_incremental_sync_reads_only_the_tail(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+    client.spreadsheet.reads.clear()
+
+    purchases = client.spreadsheet.worksheets[1]
+    purchases.append_table([[45300, 20, 'new']])
+    purchases.set_value(f'B{PURCHASES + 1 - 10}', 99)
+
+    assert store.sync(client)
+
+    start = PURCHASES + 1 - SYNC_OVERLAP + 1
+    assert (f'A{start}', f'C{PURCHASES + 2}') in client.spreadsheet.reads
+
+    rows = {row: amount for row, _, amount, _ in mirrored(store)}
+    assert len(rows) == PURCHASES + 1
+    assert rows[PURCHASES + 1 - 10] == 99
+    assert store.recent(1)[0].description == 'new'
+
+
+def test_deleted_rows_resync_everything(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+
+    purchases = client.spreadsheet.worksheets[1]
+    del purchases.values[10:150]
+    client.spreadsheet.revision += 1
+
+    store.sync(client)
+
+    assert [description for *_, description in mirrored(store)] == [row[2] for row in purchases.values[1:]]
+
+
+def test_daily_full_sync_reaches_old_rows(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+
+    # Rows deleted near the top and as many appended, the row count alone cannot tell
+    purchases = client.spreadsheet.worksheets[1]
+    del purchases.values[5:15]
+    purchases.append_table([[45300 + i, 1, f'late {i}'] for i in range(10)])
+    purchases.set_value('C2', 'corrected')
+
+    store.sync(client)
+
+    assert mirrored(store)[0][3] == 'item 0'
+
+    connection = store.connect()
+
+    with connection:
+        connection.execute("UPDATE meta SET value = ? WHERE key = 'full_synced'", (str(float(store.meta('full_synced')) - FULL_SYNC_INTERVAL),))
+
+    client.spreadsheet.reads.clear()
+
+    assert store.sync(client)
+
+    assert ('A2', f'C{PURCHASES + 1}') in client.spreadsheet.reads
+    assert [description for *_, description in mirrored(store)] == [row[2] for row in purchases.values[1:]]
+
+
+def test_incremental_matches_full_sync(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+
+    purchases = client.spreadsheet.worksheets[1]
+    purchases.append_table([[45400 + i, i, f'extra {i}'] for i in range(30)])
+    purchases.set_value(f'C{PURCHASES}', 'renamed')
+
+    store.sync(client)
+    incremental = mirrored(store)
+
+    store.sync(client, full=True)
+
+    assert mirrored(store) == incremental
+
+
+def test_monthly(client: FakeClient, store: SpendingStore) -> None:
+    store.sync(client)
+
+    months = store.monthly(2)
+
+    assert [month.month for month in months] == ['2023-09', '2023-08']
+    assert months[0] == Month('2023-09', sum(5 + i % 3 for i in range(PURCHASES) if 170 <= i < 200), 30)
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from arcueid.wishes import WishStore, derive, read_history
+
+
+def record(id: int, time: str, name: str, rank: int = 5) -> dict:
+    return {'id': str(id), 'time': time, 'gacha_type': '301', 'rank_type': str(rank), 'name': name}
+
+
+def test_featured_before_joining_standard() -> None:
+    history = read_history([
+        record(1, '2022-08-25 12:00:00', 'Tighnari'),
+        record(2, '2023-03-22 12:00:00', 'Dehya')
+    ])
+
+    assert not history.standard.any()
+    assert not derive(history, 'character').guaranteed
+
+
+def test_standard_after_joining() -> None:
+    history = read_history([
+        record(1, '2022-10-01 12:00:00', 'Tighnari'),
+        record(2, '2023-05-01 12:00:00', 'Dehya'),
+        record(3, '2023-05-01 12:00:01', 'Diluc')
+    ])
+
+    assert history.standard.all()
+    assert derive(history, 'character').guaranteed
+
+
+def test_weapon_state_has_no_fate_points() -> None:
+    history = read_history([
+        {**record(1, '2023-05-01 12:00:00', "Wolf's Gravestone"), 'gacha_type': '302'},
+        {**record(2, '2023-05-01 12:00:01', 'Dull Blade', 3), 'gacha_type': '302'}
+    ])
+
+    assert derive(history, 'weapon') == (1, True, 2)
+
+
+def test_imports_merge_and_leave_no_temporary_files(tmp_path: Path) -> None:
+    store = WishStore(tmp_path / 'wishes')
+
+    for i, name in enumerate(('Diluc', 'Nahida')):
+        upload = tmp_path / f'{i}.json'
+        upload.write_text(json.dumps({'info': {}, 'list': [record(i, '2023-05-01 12:00:00', name)]}))
+
+        added, merged = store.import_file(7, upload)
+
+        assert added == 1
+
+    assert np.array_equal(store.load(7).id, [0, 1])
+    assert [path.name for path in store.directory.iterdir()] == ['7.npz']